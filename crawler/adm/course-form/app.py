@@ -5,17 +5,42 @@ The actual forms are in an iframe: https://pdc.adm.ncu.edu.tw/Course/form.html
 """
 
 import argparse
+import csv
+import hashlib
 import json
+import os
 import re
 import shutil
+import signal
+import socket
+import ssl
 import subprocess
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
 from urllib.parse import urljoin
 
 import certifi
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
+from urllib3.util.retry import Retry
+
+# Prefer the C-based lxml parser when it is installed
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# Optional C-based HTML parser (much faster than walking a BeautifulSoup tree)
+try:
+    from selectolax.parser import HTMLParser
+    HAS_SELECTOLAX = True
+except ImportError:
+    HAS_SELECTOLAX = False
 
 # Optional imports for conversion
 HAS_PANDAS = False
@@ -24,15 +49,19 @@ HAS_XLRD = False
 HAS_WEASYPRINT = False
 HAS_PYPANDOC = False
 HAS_PYTHON_DOCX = False
+HAS_CHARSET_NORMALIZER = False
+HAS_ORJSON = False
+HAS_PYARROW = False
+
+try:
+    import openpyxl
+    HAS_OPENPYXL = True
+except ImportError:
+    pass
 
 try:
     import pandas as pd
     HAS_PANDAS = True
-    try:
-        import openpyxl
-        HAS_OPENPYXL = True
-    except ImportError:
-        pass
     try:
         import xlrd
         HAS_XLRD = True
@@ -43,6 +72,11 @@ except ImportError:
 
 try:
     from weasyprint import HTML
+    try:
+        from weasyprint.text.fonts import FontConfiguration
+    except ImportError:
+        # WeasyPrint < 53
+        from weasyprint.fonts import FontConfiguration
     HAS_WEASYPRINT = True
 except (ImportError, OSError):
     # OSError: system libraries not available (pango, cairo, etc.)
@@ -60,30 +94,242 @@ try:
 except ImportError:
     pass
 
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pacsv
+    HAS_PYARROW = True
+except ImportError:
+    pass
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    pass
+
+try:
+    # Shipped with requests >= 2.26
+    import charset_normalizer
+    HAS_CHARSET_NORMALIZER = True
+except ImportError:
+    pass
+
+# Font configuration shared by every WeasyPrint conversion; building it
+# rescans the system fonts, so it is created once on first use.
+_FONT_CONFIG = None
+
+
+def _get_font_config():
+    global _FONT_CONFIG
+    if _FONT_CONFIG is None:
+        _FONT_CONFIG = FontConfiguration()
+    return _FONT_CONFIG
+
+
+class SSLContextAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose connection pools all share one pre-built SSLContext, so
+    the CA bundle is parsed once per run instead of once per new connection.
+    Requests must then be sent with verify=True (not a bundle path), which
+    requests >= 2.32 honours without reloading the CA file.
+    """
+
+    def __init__(self, ssl_context: ssl.SSLContext = None, **kwargs):
+        self.ssl_context = ssl_context
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.ssl_context is not None:
+            kwargs["ssl_context"] = self.ssl_context
+        return super().init_poolmanager(*args, **kwargs)
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        if self.ssl_context is not None:
+            proxy_kwargs["ssl_context"] = self.ssl_context
+        return super().proxy_manager_for(proxy, **proxy_kwargs)
 
-def download_file(url: str, filepath: Path, insecure: bool = False) -> dict:
+
+def build_ssl_context(ca_bundle: str = None) -> ssl.SSLContext:
+    """Load the CA bundle (certifi's unless overridden) into a reusable context."""
+    return ssl.create_default_context(cafile=ca_bundle or certifi.where())
+
+
+def install_dns_cache(ttl: float = 300.0) -> None:
+    """
+    Memoize socket.getaddrinfo for this process. urllib3 resolves the host
+    again for every new pooled connection, and all of them go to the same
+    host here. Only the lookup result is reused; hostnames (and so SNI and
+    certificate checks) are untouched.
+    """
+    original = socket.getaddrinfo
+    if getattr(original, "_dns_cached", False):
+        return
+    cache = {}
+
+    def cached_getaddrinfo(host, port, family=0, type=0, proto=0, flags=0):
+        key = (host, port, family, type, proto, flags)
+        now = time.monotonic()
+        hit = cache.get(key)
+        if hit is not None and hit[0] > now:
+            return hit[1]
+        result = original(host, port, family, type, proto, flags)
+        cache[key] = (now + ttl, result)
+        return result
+
+    cached_getaddrinfo._dns_cached = True
+    socket.getaddrinfo = cached_getaddrinfo
+
+
+def build_session(pool_maxsize: int = 20, ssl_context: ssl.SSLContext = None) -> requests.Session:
+    """
+    Create a keep-alive session shared by the page fetches and all downloads,
+    so each connection to the host is reused instead of re-doing TLS per file.
+    """
+    session = requests.Session()
+    # gzip/deflate, plus br when the brotli package is installed
+    session.headers.update({"Accept-Encoding": make_headers(accept_encoding=True)["accept-encoding"]})
+    adapter = SSLContextAdapter(ssl_context=ssl_context, pool_connections=10, pool_maxsize=pool_maxsize,
+                                max_retries=Retry(total=3, backoff_factor=0.5))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+_CHARSET_RE = re.compile(r"""charset=["']?([\w.:-]+)""", re.IGNORECASE)
+_META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset=["']?([\w.:-]+)""", re.IGNORECASE)
+
+
+def detect_encoding(resp: requests.Response, default: str = "big5") -> str:
+    """
+    Pick a page's encoding in browser order: the Content-Type charset, a BOM,
+    a <meta> charset in the first 4 KB, then a detector over a 16 KB window
+    starting at the first non-ASCII byte. Big5 pages usually open with
+    ASCII-only markup, so the first 4 KB alone would be guessed as ascii;
+    requests' apparent_encoding would run the detector over the whole body.
+    An ASCII-only body, an ascii guess or a low-confidence match falls back
+    to default.
+    """
+    m = _CHARSET_RE.search(resp.headers.get("content-type", ""))
+    if m:
+        return m.group(1)
+    body = resp.content
+    head = body[:4096]
+    if head.startswith(b"\xef\xbb\xbf"):
+        return "utf-8-sig"
+    m = _META_CHARSET_RE.search(head)
+    if m:
+        return m.group(1).decode("ascii")
+    if HAS_CHARSET_NORMALIZER:
+        first = re.search(rb"[\x80-\xff]", body)
+        if first is None:
+            return default
+        best = charset_normalizer.from_bytes(body[first.start():first.start() + 16384]).best()
+        if best is not None and best.encoding != "ascii" and best.chaos < 0.2:
+            return best.encoding
+    return default
+
+
+def download_file(session: requests.Session, url: str, filepath: Path, insecure: bool = False,
+                  etag: str = None, last_modified: str = None) -> dict:
     """
     Download a file from URL to filepath.
-    Returns a dict with keys: ok (bool), size (int), error (str).
+    If etag/last_modified from a previous run are given, a conditional GET is
+    sent and a 304 leaves the existing file untouched.
+    Returns a dict with keys: ok (bool), size (int), error (str),
+    not_modified (bool), etag (str), last_modified (str),
+    blake2b (str, hex digest of the downloaded bytes).
     """
-    result = {"ok": False, "size": 0, "error": None}
+    result = {"ok": False, "size": 0, "error": None,
+              "not_modified": False, "etag": None, "last_modified": None, "blake2b": None}
     try:
-        verify_arg = False if insecure else certifi.where()
-        resp = requests.get(url, verify=verify_arg, timeout=30)
-        resp.raise_for_status()
-        
-        filepath.parent.mkdir(parents=True, exist_ok=True)
-        with open(filepath, "wb") as f:
-            f.write(resp.content)
+        # certificates come from the session's shared SSLContext
+        verify_arg = not insecure
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        size = 0
+        with session.get(url, headers=headers, verify=verify_arg, timeout=30, stream=True) as resp:
+            if resp.status_code == 304:
+                result.update({"ok": True, "not_modified": True,
+                               "etag": etag, "last_modified": last_modified})
+                return result
+            resp.raise_for_status()
+            result["etag"] = resp.headers.get("ETag")
+            result["last_modified"] = resp.headers.get("Last-Modified")
+            
+            # Hash while streaming so unchanged content can be detected without re-reading
+            digest = hashlib.blake2b()
+            filepath.parent.mkdir(parents=True, exist_ok=True)
+            with open(filepath, "wb") as f:
+                for chunk in resp.iter_content(chunk_size=65536):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
         
         result["ok"] = True
-        result["size"] = len(resp.content)
+        result["size"] = size
+        result["blake2b"] = digest.hexdigest()
     except Exception as e:
         result["error"] = str(e)
     
     return result
 
 
+# Formats converted through unoconv/pandoc
+WORD_EXTS = (".doc", ".docx", ".odt")
+
+# Default connection of `unoconv --listener`
+UNOCONV_LISTENER_ADDR = ("127.0.0.1", 2002)
+
+
+def start_unoconv_listener(timeout: float = 30.0):
+    """
+    Start one long-lived LibreOffice instance via `unoconv --listener`.
+    While it runs, each `unoconv -f pdf` call in convert_file connects to it
+    instead of booting (and tearing down) its own office process per document.
+    Returns the Popen handle, or None if unoconv is missing or never came up.
+    """
+    if not shutil.which("unoconv"):
+        return None
+    try:
+        proc = subprocess.Popen(
+            ["unoconv", "--listener"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+    except OSError:
+        return None
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            return None
+        try:
+            with socket.create_connection(UNOCONV_LISTENER_ADDR, timeout=1):
+                return proc
+        except OSError:
+            time.sleep(0.5)
+
+    stop_unoconv_listener(proc)
+    return None
+
+
+def stop_unoconv_listener(proc) -> None:
+    """Terminate a listener started by start_unoconv_listener (and its office child)."""
+    if proc is None:
+        return
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait(timeout=10)
+    except ProcessLookupError:
+        pass
+    except subprocess.TimeoutExpired:
+        os.killpg(proc.pid, signal.SIGKILL)
+
+
 def convert_file(filepath: Path, remove_original: bool = False) -> dict:
     """
     Convert files to RAG-friendly formats:
@@ -111,30 +357,54 @@ def convert_file(filepath: Path, remove_original: bool = False) -> dict:
     
     try:
         # Excel to CSV
-        if ext in (".xls", ".xlsx"):
+        if ext == ".xlsx":
+            if not HAS_OPENPYXL:
+                result["reason"] = "openpyxl not installed (required for .xlsx)"
+                return result
+            
+            # Stream rows straight into the CSV writer instead of building a DataFrame
+            try:
+                csv_path = filepath.with_suffix(".csv")
+                wb = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
+                try:
+                    # First sheet, same as pd.read_excel's default
+                    ws = wb.worksheets[0]
+                    with open(csv_path, "w", newline="", encoding="utf-8") as fh:
+                        csv.writer(fh).writerows(ws.iter_rows(values_only=True))
+                finally:
+                    wb.close()
+                result["converted"] = str(csv_path)
+                result["ok"] = True
+                result["action"] = "converted"
+                result["reason"] = "excel->csv (openpyxl streaming)"
+                if remove_original:
+                    filepath.unlink()
+            except Exception as e:
+                result["reason"] = f"openpyxl conversion failed: {e}"
+        
+        elif ext == ".xls":
             if not HAS_PANDAS:
                 result["reason"] = "pandas not installed"
                 return result
-            
-            # Choose engine based on extension
-            engine = None
-            if ext == ".xls":
-                if HAS_XLRD:
-                    engine = "xlrd"
-                else:
-                    result["reason"] = "xlrd not installed (required for .xls)"
-                    return result
-            elif ext == ".xlsx":
-                if HAS_OPENPYXL:
-                    engine = "openpyxl"
-                else:
-                    result["reason"] = "openpyxl not installed (required for .xlsx)"
-                    return result
+            if not HAS_XLRD:
+                result["reason"] = "xlrd not installed (required for .xls)"
+                return result
+            engine = "xlrd"
             
             try:
                 df = pd.read_excel(filepath, engine=engine)
                 csv_path = filepath.with_suffix(".csv")
-                df.to_csv(csv_path, index=False, encoding="utf-8")
+                written = False
+                if HAS_PYARROW:
+                    # Vectorized writer; mixed-type object columns can't be
+                    # converted to Arrow, so those fall back to pandas
+                    try:
+                        pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), str(csv_path))
+                        written = True
+                    except (pa.ArrowException, ValueError, TypeError):
+                        pass
+                if not written:
+                    df.to_csv(csv_path, index=False, encoding="utf-8")
                 result["converted"] = str(csv_path)
                 result["ok"] = True
                 result["action"] = "converted"
@@ -151,7 +421,7 @@ def convert_file(filepath: Path, remove_original: bool = False) -> dict:
             # Try WeasyPrint
             if HAS_WEASYPRINT:
                 try:
-                    HTML(filename=str(filepath)).write_pdf(pdf_path)
+                    HTML(filename=str(filepath)).write_pdf(pdf_path, font_config=_get_font_config())
                     result["converted"] = str(pdf_path)
                     result["ok"] = True
                     result["action"] = "converted"
@@ -183,22 +453,32 @@ def convert_file(filepath: Path, remove_original: bool = False) -> dict:
             
             # Fallback: extract text from HTML to .txt
             try:
-                # Try to detect encoding (common Chinese encodings)
+                # Read once, then detect the encoding on the bytes in memory
+                raw = filepath.read_bytes()
                 html_content = None
-                for enc in ['utf-8', 'big5', 'gb2312', 'gbk']:
-                    try:
-                        with open(filepath, "r", encoding=enc) as fh:
-                            html_content = fh.read()
+                if HAS_CHARSET_NORMALIZER:
+                    best = charset_normalizer.from_bytes(raw).best()
+                    if best is not None:
+                        html_content = str(best)
+                if html_content is None:
+                    # Common Chinese encodings
+                    for enc in ['utf-8', 'big5', 'gb2312', 'gbk']:
+                        try:
+                            html_content = raw.decode(enc)
                             break
-                    except (UnicodeDecodeError, LookupError):
-                        continue
+                        except (UnicodeDecodeError, LookupError):
+                            continue
                 
                 if html_content is None:
-                    with open(filepath, "r", encoding="utf-8", errors="ignore") as fh:
-                        html_content = fh.read()
+                    html_content = raw.decode("utf-8", errors="ignore")
                 
-                soup = BeautifulSoup(html_content, "html.parser")
-                text = soup.get_text("\n", strip=True)
+                if HAS_SELECTOLAX:
+                    tree = HTMLParser(html_content)
+                    tree.strip_tags(["script", "style"])
+                    text = tree.text(separator="\n", strip=True)
+                else:
+                    soup = BeautifulSoup(html_content, HTML_PARSER)
+                    text = soup.get_text("\n", strip=True)
                 txt_path = filepath.with_suffix(".txt")
                 with open(txt_path, "w", encoding="utf-8") as out:
                     out.write(text)
@@ -212,7 +492,7 @@ def convert_file(filepath: Path, remove_original: bool = False) -> dict:
                 result["reason"] = (result["reason"] or "") + ("; " if result["reason"] else "") + f"html->txt fallback failed: {e}"
         
         # Word to PDF (prefer pandoc). Fallback: DOCX->TXT if python-docx available.
-        elif ext in [".doc", ".docx", ".odt"]:
+        elif ext in WORD_EXTS:
             pdf_path = filepath.with_suffix(".pdf")
 
             # Try unoconv first, as it's the most reliable for .doc
@@ -325,29 +605,91 @@ def convert_file(filepath: Path, remove_original: bool = False) -> dict:
     return result
 
 
+def dump_json(obj) -> bytes:
+    """Serialize obj as indented UTF-8 JSON, using orjson when available."""
+    if HAS_ORJSON:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+
+
+class MetadataWriter:
+    """
+    Stream metadata records into a JSON array as each one is finalized.
+    Records go to a temporary file that replaces the target on close(), so an
+    interrupted run never leaves a truncated metadata.json behind.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.tmp_path = path.with_name(path.name + ".tmp")
+        self.count = 0
+        self._fh = open(self.tmp_path, "wb")
+
+    def write(self, record: dict) -> None:
+        self._fh.write(b"[\n" if self.count == 0 else b",\n")
+        self._fh.write(dump_json(record))
+        self.count += 1
+
+    def close(self) -> None:
+        self._fh.write(b"[]\n" if self.count == 0 else b"\n]\n")
+        self._fh.close()
+        os.replace(self.tmp_path, self.path)
+
+
+def load_previous_metadata(metadata_file: Path) -> dict:
+    """Return the records of a previous run's metadata.json keyed by URL."""
+    try:
+        with open(metadata_file, "r", encoding="utf-8") as f:
+            return {m["url"]: m for m in json.load(f) if m.get("downloaded")}
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+
+
+def has_local_copy(prev: dict, filepath: Path) -> bool:
+    """Whether the file (or its converted output) from a previous run is still on disk."""
+    if filepath.exists():
+        return True
+    converted = (prev.get("conversion") or {}).get("converted")
+    return bool(converted) and Path(converted).exists()
+
+
 def extract_iframe_src(html_text: str) -> str:
     """Extract iframe src from HTML text. Returns empty string if not found."""
-    soup = BeautifulSoup(html_text, "html.parser")
+    if HAS_SELECTOLAX:
+        iframe = HTMLParser(html_text).css_first("iframe")
+        return (iframe.attributes.get("src") or "") if iframe is not None else ""
+    soup = BeautifulSoup(html_text, HTML_PARSER, parse_only=SoupStrainer("iframe"))
     iframe = soup.find("iframe")
     if iframe and iframe.get("src"):
         return iframe["src"]
     return ""
 
 
-def extract_links(html_text: str, base_url: str, extensions: list) -> list:
+def build_extension_pattern(extensions: list) -> "re.Pattern":
+    """Compile one regex matching any of the extensions at the end of a URL path."""
+    alternatives = "|".join(re.escape(ext.lstrip(".")) for ext in extensions)
+    return re.compile(r"\.(?:" + alternatives + r")(?:$|[?#])", re.IGNORECASE)
+
+
+def extract_links(html_text: str, base_url: str, ext_pattern: "re.Pattern") -> list:
     """
-    Extract all links from HTML text that match the given extensions.
+    Extract all links from HTML text whose href matches ext_pattern
+    (see build_extension_pattern).
     Returns list of dicts with keys: text, href, abs_url
     """
-    soup = BeautifulSoup(html_text, "html.parser")
+    if HAS_SELECTOLAX:
+        anchors = ((a.attributes.get("href") or "", a) for a in HTMLParser(html_text).css("a[href]"))
+        get_text = lambda a: a.text(strip=True)
+    else:
+        soup = BeautifulSoup(html_text, HTML_PARSER, parse_only=SoupStrainer("a", href=True))
+        anchors = ((a["href"], a) for a in soup.find_all("a", href=True))
+        get_text = lambda a: a.get_text(strip=True)
     links = []
     
-    for link in soup.find_all("a", href=True):
-        href = link["href"]
-        # Check if any extension matches
-        if any(ext.lower() in href.lower() for ext in extensions):
+    for href, link in anchors:
+        if ext_pattern.search(href):
             abs_url = urljoin(base_url, href)
-            text = link.get_text(strip=True)
+            text = get_text(link)
             links.append({
                 "text": text,
                 "href": href,
@@ -375,6 +717,8 @@ def main(argv=None):
                         help="Path to CA bundle file for SSL verification")
     parser.add_argument("--no-metadata", action="store_true",
                         help="Do not write the metadata.json file")
+    parser.add_argument("--jobs", type=int, default=8,
+                        help="Number of concurrent downloads")
     
     args = parser.parse_args(argv)
     
@@ -387,17 +731,22 @@ def main(argv=None):
             pass
     
     extensions = [f".{ext.strip().lstrip('.')}" for ext in args.extensions.split(",")]
+    ext_pattern = build_extension_pattern(extensions)
     output_dir = Path(args.output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
 
     # Step 1: Fetch the main page
     print(f"Fetching main page: {args.url}")
-    verify_arg = False if args.insecure else (args.ca_bundle or certifi.where())
+    verify_arg = not args.insecure
+    install_dns_cache()
+    ssl_context = None if args.insecure else build_ssl_context(args.ca_bundle)
+    session = build_session(pool_maxsize=max(20, args.jobs), ssl_context=ssl_context)
     
     try:
-        r = requests.get(args.url, verify=verify_arg, timeout=30)
-        r.encoding = r.apparent_encoding or "big5"
+        r = session.get(args.url, verify=verify_arg, timeout=30)
+        r.encoding = detect_encoding(r)
         r.raise_for_status()
+        print(f"Content-Encoding: {r.headers.get('Content-Encoding', 'identity')}")
     except Exception as e:
         print(f"Error fetching main page: {e}", file=sys.stderr)
         return 1
@@ -413,15 +762,16 @@ def main(argv=None):
     
     # Step 3: Fetch iframe content
     try:
-        r_iframe = requests.get(iframe_url, verify=verify_arg, timeout=30)
-        r_iframe.encoding = r_iframe.apparent_encoding or "big5"
+        r_iframe = session.get(iframe_url, verify=verify_arg, timeout=30)
+        r_iframe.encoding = detect_encoding(r_iframe)
         r_iframe.raise_for_status()
+        print(f"Content-Encoding: {r_iframe.headers.get('Content-Encoding', 'identity')}")
     except Exception as e:
         print(f"Error fetching iframe: {e}", file=sys.stderr)
         return 1
     
     # Step 4: Extract all file links
-    links = extract_links(r_iframe.text, iframe_url, extensions)
+    links = extract_links(r_iframe.text, iframe_url, ext_pattern)
     print(f"Found {len(links)} file links")
     
     if not links:
@@ -429,61 +779,143 @@ def main(argv=None):
         return 0
     
     # Step 5: Download files
-    metadata = []
     downloaded = 0
     failed = 0
-    
-    for link in links:
-        filename = Path(link["abs_url"]).name
+    unchanged = 0
+
+    # Validators from the last run turn unchanged files into 304 round trips
+    previous = {}
+    if not args.no_metadata:
+        previous = load_previous_metadata(output_dir / "metadata.json")
+
+    # Links sharing a filename are fetched in order within one task so the
+    # last one still wins, as it did when downloads were sequential.
+    groups = {}
+    for index, link in enumerate(links):
+        groups.setdefault(Path(link["abs_url"]).name, []).append(index)
+
+    def download_group(filename, indices):
         filepath = output_dir / filename
-        
-        print(f"Downloading: {filename}")
-        result = download_file(link["abs_url"], filepath, insecure=args.insecure)
-        
-        meta = {
-            "filename": filename,
-            "url": link["abs_url"],
-            "text": link["text"],
-            "downloaded": result["ok"],
-            "size": result["size"],
-            "error": result["error"]
-        }
-        
-        if result["ok"]:
-            downloaded += 1
+        group_results = []
+        for index in indices:
+            url = links[index]["abs_url"]
+            prev = previous.get(url)
+            validators = {}
+            if prev and has_local_copy(prev, filepath):
+                validators = {"etag": prev.get("etag"), "last_modified": prev.get("last_modified")}
+            print(f"Downloading: {filename}")
+            group_results.append((index, download_file(session, url, filepath, insecure=args.insecure, **validators)))
+        return group_results
+
+    results = [None] * len(links)
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        futures = [executor.submit(download_group, name, indices) for name, indices in groups.items()]
+        for future in futures:
+            for index, result in future.result():
+                results[index] = result
+
+    # Keep one office instance alive for all Word conversions
+    listener = None
+    if args.convert and any(Path(link["abs_url"]).suffix.lower() in WORD_EXTS for link in links):
+        listener = start_unoconv_listener()
+
+    # Conversions are CPU-bound and independent, so they run in worker
+    # processes; recycling workers also returns WeasyPrint's memory.
+    pool = None
+    if args.convert:
+        pool_kwargs = {"max_tasks_per_child": 8} if sys.version_info >= (3, 11) else {}
+        pool = ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, 4), **pool_kwargs)
+
+    # Step 6: Save metadata, record by record as each one is finalized
+    writer = None if args.no_metadata else MetadataWriter(output_dir / "metadata.json")
+    conversion_counts = {"converted": 0, "skipped": 0, "failed": 0}
+
+    def emit(meta):
+        if "conversion" in meta:
+            action = meta["conversion"]["action"]
+            conversion_counts[action] = conversion_counts.get(action, 0) + 1
+        if writer is not None:
+            writer.write(meta)
+
+    try:
+        pending = {}
+        for link, result in zip(links, results):
+            filename = Path(link["abs_url"]).name
+            filepath = output_dir / filename
+
+            prev = previous.get(link["abs_url"]) or {}
+            meta = {
+                "filename": filename,
+                "url": link["abs_url"],
+                "text": link["text"],
+                "downloaded": result["ok"],
+                "size": prev.get("size", 0) if result["not_modified"] else result["size"],
+                "error": result["error"],
+                "unchanged": result["not_modified"],
+                "etag": result["etag"],
+                "last_modified": result["last_modified"],
+                "blake2b": prev.get("blake2b") if result["not_modified"] else result["blake2b"]
+            }
             
-            # Convert if requested
-            if args.convert:
-                conv_result = convert_file(filepath, remove_original=args.remove_originals)
+            if result["ok"]:
+                downloaded += 1
+                if result["not_modified"]:
+                    unchanged += 1
+                
+                # Reuse the previous conversion of an unchanged file (a 304, or identical
+                # bytes behind a cosmetically new Last-Modified) if its output is still there
+                prev_conversion = prev.get("conversion")
+                same_content = result["not_modified"] or (meta["blake2b"] is not None and meta["blake2b"] == prev.get("blake2b"))
+                if (pool is not None and same_content and prev_conversion and prev_conversion.get("ok")
+                        and (not prev_conversion.get("converted") or Path(prev_conversion["converted"]).exists())):
+                    meta["conversion"] = prev_conversion
+                    if (args.remove_originals and not result["not_modified"]
+                            and prev_conversion.get("action") == "converted" and filepath.exists()):
+                        filepath.unlink()
+                
+                # Convert if requested (once per file, even if several links share it)
+                elif pool is not None:
+                    if filepath not in pending:
+                        pending[filepath] = (pool.submit(convert_file, filepath, args.remove_originals), [])
+                    pending[filepath][1].append(meta)
+                    continue
+            else:
+                failed += 1
+            
+            emit(meta)
+
+        futures = {future: metas for future, metas in pending.values()}
+        for future in as_completed(futures):
+            try:
+                conv_result = future.result()
+            except Exception as e:
+                conv_result = {"ok": False, "converted": None, "action": "failed", "reason": str(e)}
+            for meta in futures[future]:
                 meta["conversion"] = {
                     "ok": conv_result["ok"],
                     "converted": conv_result["converted"],
                     "action": conv_result["action"],
                     "reason": conv_result["reason"]
                 }
-        else:
-            failed += 1
-        
-        metadata.append(meta)
-    
-    # Step 6: Save metadata
-    if not args.no_metadata:
-        metadata_file = output_dir / "metadata.json"
-        with open(metadata_file, "w", encoding="utf-8") as f:
-            json.dump(metadata, f, indent=2, ensure_ascii=False)
-    
+                emit(meta)
+
+        if writer is not None:
+            writer.close()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        stop_unoconv_listener(listener)
+
     # Step 7: Print summary
     print(f"\n=== Summary ===")
     print(f"Downloaded: {downloaded}")
+    print(f"Unchanged: {unchanged}")
     print(f"Failed: {failed}")
     
     if args.convert:
-        converted = sum(1 for m in metadata if m.get("conversion", {}).get("action") == "converted")
-        skipped = sum(1 for m in metadata if m.get("conversion", {}).get("action") == "skipped")
-        conv_failed = sum(1 for m in metadata if m.get("conversion", {}).get("action") == "failed")
-        print(f"Converted: {converted}")
-        print(f"Skipped: {skipped}")
-        print(f"Conversion failed: {conv_failed}")
+        print(f"Converted: {conversion_counts['converted']}")
+        print(f"Skipped: {conversion_counts['skipped']}")
+        print(f"Conversion failed: {conversion_counts['failed']}")
     
     if not args.no_metadata:
         print(f"\nMetadata saved to: {output_dir / 'metadata.json'}")
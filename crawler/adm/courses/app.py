@@ -13,18 +13,37 @@ import json
 import logging
 import os
 import sys
+import re
 import time
 import hashlib
+import secrets
+import shutil
+import socket
+import ssl
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List
 from urllib.parse import urljoin, urlparse, unquote
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as Urllib3Error
+from urllib3.util import make_headers
+from urllib3.util.retry import Retry
 try:
     import certifi
 except Exception:
     certifi = None
-from bs4 import BeautifulSoup
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    from requests_cache import CachedSession
+except ImportError:
+    CachedSession = None
+from selectolax.parser import HTMLParser
 
 
 DEFAULT_EXTENSIONS = [
@@ -42,17 +61,80 @@ DEFAULT_EXTENSIONS = [
     # "html",
 ]
 
+# filename="a.pdf" or RFC 5987 filename*=UTF-8''a.pdf
+_CONTENT_DISPOSITION_RE = re.compile(r"filename\*?=(?:[\w-]+'[^']*')?\"?([^\";]+)", re.IGNORECASE)
+
+
+class SSLContextAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose connection pools all share one pre-built SSLContext, so
+    the CA bundle is parsed once per run instead of once per new connection.
+    Requests must then be sent with verify=True (not a bundle path), which
+    requests >= 2.32 honours without reloading the CA file.
+    """
+
+    def __init__(self, ssl_context: ssl.SSLContext | None = None, **kwargs):
+        self.ssl_context = ssl_context
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.ssl_context is not None:
+            kwargs["ssl_context"] = self.ssl_context
+        return super().init_poolmanager(*args, **kwargs)
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        if self.ssl_context is not None:
+            proxy_kwargs["ssl_context"] = self.ssl_context
+        return super().proxy_manager_for(proxy, **proxy_kwargs)
+
+
+def install_dns_cache(ttl: float = 300.0) -> None:
+    """
+    Memoize socket.getaddrinfo for this process. urllib3 resolves the host
+    again for every new pooled connection, and all of them go to the same
+    host here. Only the lookup result is reused; hostnames (and so SNI and
+    certificate checks) are untouched.
+    """
+    original = socket.getaddrinfo
+    if getattr(original, "_dns_cached", False):
+        return
+    cache = {}
+
+    def cached_getaddrinfo(host, port, family=0, type=0, proto=0, flags=0):
+        key = (host, port, family, type, proto, flags)
+        now = time.monotonic()
+        hit = cache.get(key)
+        if hit is not None and hit[0] > now:
+            return hit[1]
+        result = original(host, port, family, type, proto, flags)
+        cache[key] = (now + ttl, result)
+        return result
+
+    cached_getaddrinfo._dns_cached = True
+    socket.getaddrinfo = cached_getaddrinfo
+
+
+def build_page_session(session: requests.Session, cache_path: Path) -> requests.Session:
+    """
+    Session for the index page: a requests-cache CachedSession that shares
+    the download session's headers and adapters, or the session itself when
+    requests-cache is not installed. Downloads stay on the plain session so
+    files never end up in the cache.
+    """
+    if CachedSession is None:
+        return session
+    cached = CachedSession(str(cache_path), expire_after=3600, allowable_codes=(200,))
+    cached.headers.update(session.headers)
+    for prefix, adapter in session.adapters.items():
+        cached.mount(prefix, adapter)
+    return cached
+
 
 def safe_filename(name: str) -> str:
-    # strip query and fragments
-    name = name.split("?")[0].split("#")[0]
-    name = unquote(name)
-    name = name.replace("/", "_")
-    name = name.strip()
-    if not name:
-        # fallback to hash
-        name = hashlib.sha1(os.urandom(16)).hexdigest()
-    return name
+    # strip query and fragment, then keep the name on one path level
+    name = unquote(name.split("?", 1)[0].split("#", 1)[0]).replace("/", "_").strip()
+    # fallback to a random token
+    return name or secrets.token_hex(8)
 
 
 def is_valid_link(href: str) -> bool:
@@ -67,10 +149,9 @@ def is_valid_link(href: str) -> bool:
 
 
 def extract_links(html: str, base: str) -> List[str]:
-    soup = BeautifulSoup(html, "html.parser")
     links: List[str] = []
-    for a in soup.find_all("a", href=True):
-        href = a["href"]
+    for a in HTMLParser(html).css("a[href]"):
+        href = a.attributes.get("href")
         if not is_valid_link(href):
             continue
         full = urljoin(base, href)
@@ -78,67 +159,203 @@ def extract_links(html: str, base: str) -> List[str]:
     return links
 
 
-def has_allowed_ext(url: str, allowed: List[str]) -> bool:
-    parsed = urlparse(url)
-    path = parsed.path.lower()
-    for ext in allowed:
-        if path.endswith("." + ext.lower()):
-            return True
-    return False
+def build_extension_pattern(extensions: list) -> "re.Pattern":
+    """Compile one regex matching any of the extensions at the end of a URL path."""
+    alternatives = "|".join(re.escape(ext.lstrip(".")) for ext in extensions)
+    return re.compile(r"\.(?:" + alternatives + r")(?:$|[?#])", re.IGNORECASE)
+
+
+def has_allowed_ext(url: str, ext_pattern: "re.Pattern") -> bool:
+    return ext_pattern.search(url) is not None
+
 
+def dump_json(obj) -> bytes:
+    """Serialize obj as indented UTF-8 JSON, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def load_previous_results(meta_file: Path) -> dict:
+    """Return the successful records of a previous metadata.json keyed by URL."""
+    try:
+        with open(meta_file, "r", encoding="utf-8") as fh:
+            return {r["url"]: r for r in json.load(fh).get("results", []) if r.get("ok")}
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return {}
+
+
+def filename_from_headers(url: str, headers) -> str:
+    # determine filename, preferring the server-supplied one
+    m = _CONTENT_DISPOSITION_RE.search(headers.get("content-disposition", ""))
+    if m:
+        name = safe_filename(m.group(1))
+    else:
+        name = safe_filename(os.path.basename(urlparse(url).path))
+    if not Path(name).suffix:
+        # try to infer from Content-Type
+        ctype = headers.get("content-type", "")
+        if "pdf" in ctype:
+            name = name + ".pdf"
+        elif "word" in ctype or "officedocument" in ctype:
+            # fallback to .docx
+            name = name + ".docx"
+    return name
 
-def download_file(session: requests.Session, url: str, dest: Path, max_retries: int = 3, verify=True) -> dict:
-    record = {"url": url, "ok": False, "filename": None, "reason": None}
-    for attempt in range(1, max_retries + 1):
+
+def create_outfile(dest: Path, name: str, url: str) -> tuple[Path, int]:
+    """
+    Create a new file for name in dest and return its path and an open
+    descriptor. O_EXCL makes the create itself the collision check, so
+    concurrent downloads cannot pick the same name.
+    """
+    outpath = dest / name
+    flags = os.O_WRONLY | os.O_CREAT
+    try:
+        return outpath, os.open(outpath, flags | os.O_EXCL, 0o644)
+    except FileExistsError:
+        # avoid overwriting another file: on collision add a short hash of
+        # the URL, which stays the same across runs
+        tag = hashlib.blake2b(url.encode("utf-8"), digest_size=4).hexdigest()
+        outpath = dest / f"{outpath.stem}_{tag}{outpath.suffix}"
+        try:
+            if outpath.stat().st_nlink > 1:
+                # hardlinked to another year's copy; truncating would empty that file too
+                outpath.unlink()
+        except FileNotFoundError:
+            pass
+        return outpath, os.open(outpath, flags | os.O_TRUNC, 0o644)
+
+
+class DownloadIndex:
+    """
+    Files already on disk under any year directory, keyed by host and URL
+    basename and then by size. The same PDF is usually linked from every
+    year's page, so a HEAD whose Content-Length matches a known file lets us
+    hardlink that file instead of downloading it again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._files = {}
+
+    @staticmethod
+    def _key(url: str) -> tuple:
+        parsed = urlparse(url)
+        return parsed.netloc.lower(), os.path.basename(parsed.path)
+
+    def add(self, url: str, path: Path) -> None:
         try:
-            resp = session.get(url, stream=True, timeout=20, verify=verify)
+            size = path.stat().st_size
+        except OSError:
+            return
+        with self._lock:
+            self._files.setdefault(self._key(url), {})[size] = path
+
+    def has(self, url: str) -> bool:
+        with self._lock:
+            return self._key(url) in self._files
+
+    def find(self, url: str, size: int) -> Path | None:
+        with self._lock:
+            path = self._files.get(self._key(url), {}).get(size)
+        if path is not None and path.is_file() and path.stat().st_size == size:
+            return path
+        return None
+
+
+def link_known_copy(session: requests.Session, url: str, dest: Path, index: DownloadIndex,
+                    verify=True) -> dict | None:
+    """
+    HEAD the URL and, if another year already holds a file with the same
+    name and size, hardlink it into dest. Returns the record, or None when
+    the file still has to be downloaded.
+    """
+    try:
+        # identity, so Content-Length is the size of the file we would write
+        head = session.head(url, headers={"Accept-Encoding": "identity"}, allow_redirects=True,
+                            timeout=20, verify=verify)
+        length = int(head.headers.get("Content-Length", ""))
+    except (requests.RequestException, ValueError) as e:
+        logging.debug("HEAD failed for %s: %s", url, e)
+        return None
+    if head.status_code != 200:
+        return None
+    match = index.find(url, length)
+    if match is None:
+        return None
+
+    outpath, fd = create_outfile(dest, filename_from_headers(url, head.headers), url)
+    os.close(fd)
+    try:
+        # link next to the reserved name, then swap it in atomically
+        tmp = outpath.with_name(outpath.name + ".link")
+        os.link(match, tmp)
+        os.replace(tmp, outpath)
+    except OSError:
+        shutil.copy2(match, outpath)
+    return {"url": url, "ok": True, "filename": str(outpath), "reason": None, "cached": False,
+            "etag": head.headers.get("ETag"), "last_modified": head.headers.get("Last-Modified"),
+            "dedup_of": str(match)}
+
+
+def download_file(session: requests.Session, url: str, dest: Path, verify=True, previous: dict | None = None,
+                  index: DownloadIndex | None = None) -> dict:
+    # retries and backoff are handled by the session's HTTPAdapter
+    record = {"url": url, "ok": False, "filename": None, "reason": None,
+              "cached": False, "etag": None, "last_modified": None, "dedup_of": None}
+
+    # A file from the last run is revalidated and, if it changed, overwritten in place
+    known_path = None
+    headers = {}
+    if previous and previous.get("filename") and Path(previous["filename"]).is_file():
+        known_path = Path(previous["filename"])
+        if previous.get("etag"):
+            headers["If-None-Match"] = previous["etag"]
+        if previous.get("last_modified"):
+            headers["If-Modified-Since"] = previous["last_modified"]
+    elif index is not None and index.has(url):
+        linked = link_known_copy(session, url, dest, index, verify=verify)
+        if linked is not None:
+            return linked
+
+    try:
+        with session.get(url, headers=headers, stream=True, timeout=20, verify=verify) as resp:
+            if resp.status_code == 304 and known_path is not None:
+                record.update({"ok": True, "filename": str(known_path), "cached": True,
+                               "etag": previous.get("etag"), "last_modified": previous.get("last_modified")})
+                return record
             if resp.status_code != 200:
                 record["reason"] = f"status_{resp.status_code}"
                 logging.debug("Non-200 for %s: %s", url, resp.status_code)
-                time.sleep(1)
-                continue
-
-            # determine filename
-            parsed = urlparse(url)
-            name = os.path.basename(parsed.path)
-            name = safe_filename(name)
-            if not Path(name).suffix:
-                # try to infer from Content-Type
-                ctype = resp.headers.get("content-type", "")
-                if "pdf" in ctype:
-                    name = name + ".pdf"
-                elif "word" in ctype or "officedocument" in ctype:
-                    # fallback to .docx
-                    name = name + ".docx"
-
-            outpath = dest / name
-            # avoid overwriting: if exists, add suffix
-            if outpath.exists():
-                stem = outpath.stem
-                suffix = outpath.suffix
-                i = 1
-                while True:
-                    candidate = dest / f"{stem}_{i}{suffix}"
-                    if not candidate.exists():
-                        outpath = candidate
-                        break
-                    i += 1
-
-            with open(outpath, "wb") as fh:
-                for chunk in resp.iter_content(chunk_size=8192):
-                    if chunk:
-                        fh.write(chunk)
-
-            record.update({"ok": True, "filename": str(outpath), "reason": None})
-            return record
+                return record
 
-        except requests.RequestException as e:
-            record["reason"] = str(e)
-            logging.debug("Attempt %s failed for %s: %s", attempt, url, e)
-            time.sleep(1)
-            continue
+            record["etag"] = resp.headers.get("ETag")
+            record["last_modified"] = resp.headers.get("Last-Modified")
+
+            if known_path is not None:
+                outpath = known_path
+                if outpath.stat().st_nlink > 1:
+                    # hardlinked to another year's copy; write a fresh file instead of through the link
+                    outpath.unlink()
+                fd = os.open(outpath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            else:
+                outpath, fd = create_outfile(dest, filename_from_headers(url, resp.headers), url)
 
-    return record
+            # let urllib3 undo any Content-Encoding, then copy in large blocks
+            resp.raw.decode_content = True
+            with os.fdopen(fd, "wb", buffering=0) as fh:
+                shutil.copyfileobj(resp.raw, fh, 1 << 18)
+
+        record.update({"ok": True, "filename": str(outpath), "reason": None})
+        if index is not None:
+            index.add(url, outpath)
+        return record
+
+    except (requests.RequestException, Urllib3Error) as e:
+        record["reason"] = str(e)
+        logging.debug("Download failed for %s: %s", url, e)
+        return record
 
 
 def main(argv=None):
@@ -154,20 +371,25 @@ def main(argv=None):
     parser.add_argument("--insecure", action="store_true", help="Disable SSL certificate verification (insecure)")
     parser.add_argument("--ca-bundle", required=False, help="Path to a custom CA bundle file to use for verification", default=None)
     parser.add_argument("--no-metadata", action="store_true", help="Do not write metadata.json or summary.json files")
+    parser.add_argument("--no-cache", action="store_true", help="Always fetch the index page from the server")
+    parser.add_argument("--jobs", type=int, required=False, help="Number of concurrent downloads", default=8)
     args = parser.parse_args(argv)
 
     logging.basicConfig(level=logging.INFO if not args.quiet else logging.WARNING,
                         format="%(levelname)s: %(message)s")
 
-    allowed = [e.strip().lower() for e in args.extensions.split(",") if e.strip()]
+    allowed = build_extension_pattern([e.strip() for e in args.extensions.split(",") if e.strip()])
 
     base_dir = Path(__file__).resolve().parent
     out_dir = base_dir / args.outdir
     out_dir.mkdir(parents=True, exist_ok=True)
 
+    install_dns_cache()
     session = requests.Session()
     session.headers.update({
-        "User-Agent": "ncu-campus-qa-bot/1.0 (+https://github.com/)"
+        "User-Agent": "ncu-campus-qa-bot/1.0 (+https://github.com/)",
+        # gzip/deflate, plus br when the brotli package is installed
+        "Accept-Encoding": make_headers(accept_encoding=True)["accept-encoding"],
     })
 
     # parse years list
@@ -196,66 +418,85 @@ def main(argv=None):
         sys.exit(2)
 
     logging.info("Will crawl years: %s", ",".join(years))
-    # determine verification mode
+    # determine verification mode; certificates come from one shared SSLContext
+    verify = not args.insecure
     if args.insecure:
-        verify = False
-    elif args.ca_bundle:
-        verify = args.ca_bundle
+        ssl_context = None
     else:
-        verify = certifi.where() if certifi is not None else True
-
-    all_results = []
-    # For each year, build the page URL and download matching files into out_dir/<year>/
+        cafile = args.ca_bundle or (certifi.where() if certifi is not None else None)
+        ssl_context = ssl.create_default_context(cafile=cafile)
+    # exponential backoff on transient failures; 429/503 wait as long as Retry-After asks
+    retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                    allowed_methods={"GET", "HEAD"}, respect_retry_after_header=True)
+    adapter = SSLContextAdapter(ssl_context=ssl_context, pool_connections=32, pool_maxsize=max(64, args.jobs),
+                                max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    # the index page rarely changes, so it may come from a local cache
+    page_session = session if args.no_cache else build_page_session(session, base_dir / "page_cache.sqlite")
+
+    # Results of the last run per year; every existing file also seeds the
+    # cross-year index so identical PDFs are linked rather than re-downloaded
+    previous_by_year = {}
+    index = DownloadIndex()
     for year in years:
+        previous_by_year[year] = {} if args.no_metadata else load_previous_results(out_dir / year / "metadata.json")
+        for url, rec in previous_by_year[year].items():
+            index.add(url, Path(rec["filename"]))
+
+    # For each year, build the page URL and download matching files into out_dir/<year>/.
+    # Years are independent (own page, own directory), so they run side by side;
+    # each one still downloads its files through its own bounded pool.
+    def process_year(year: str) -> dict:
         page_url = args.url.replace("rule114", f"rule{year}")
         logging.info("Fetching page for year %s: %s", year, page_url)
         try:
-            r = session.get(page_url, timeout=20, verify=verify)
+            r = page_session.get(page_url, timeout=20, verify=verify)
             r.raise_for_status()
+            logging.debug("Content-Encoding for %s: %s", page_url, r.headers.get("Content-Encoding", "identity"))
         except requests.RequestException as e:
             logging.error("Failed to fetch %s: %s", page_url, e)
-            all_results.append({"year": year, "source_page": page_url, "results": [], "error": str(e)})
-            continue
+            return {"year": year, "source_page": page_url, "results": [], "error": str(e)}
 
         links = extract_links(r.text, page_url)
         logging.info("Found %d links on the page for year %s", len(links), year)
 
         # filter and deduplicate
-        to_download = []
-        seen = set()
-        for link in links:
-            if link in seen:
-                continue
-            seen.add(link)
-            if has_allowed_ext(link, allowed):
-                to_download.append(link)
+        to_download = [link for link in dict.fromkeys(links) if has_allowed_ext(link, allowed)]
 
         logging.info("Year %s: Will download %d files (matching extensions)", year, len(to_download))
 
         year_out = out_dir / year
         year_out.mkdir(parents=True, exist_ok=True)
+        previous = previous_by_year[year]
 
-        results = []
-        for url in to_download:
+        def fetch(url):
             logging.info("[%s] Downloading %s", year, url)
-            rec = download_file(session, url, year_out, verify=verify)
-            results.append(rec)
+            return download_file(session, url, year_out, verify=verify, previous=previous.get(url), index=index)
+
+        with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+            results = list(executor.map(fetch, to_download))
 
         ok_count = sum(1 for r in results if r.get("ok"))
+        cached_count = sum(1 for r in results if r.get("cached"))
+        linked_count = sum(1 for r in results if r.get("dedup_of"))
         if not args.no_metadata:
             meta_file = year_out / "metadata.json"
-            with open(meta_file, "w", encoding="utf-8") as fh:
-                json.dump({"source_page": page_url, "fetched_at": int(time.time()), "results": results}, fh, ensure_ascii=False, indent=2)
-            logging.info("Year %s completed: %d succeeded, %d failed. Metadata: %s", year, ok_count, len(results) - ok_count, meta_file)
+            meta_file.write_bytes(dump_json({"source_page": page_url, "fetched_at": int(time.time()), "results": results}))
+            logging.info("Year %s completed: %d succeeded (%d unchanged, %d linked), %d failed. Metadata: %s",
+                         year, ok_count, cached_count, linked_count, len(results) - ok_count, meta_file)
         else:
-            logging.info("Year %s completed: %d succeeded, %d failed.", year, ok_count, len(results) - ok_count)
-        all_results.append({"year": year, "source_page": page_url, "results": results})
+            logging.info("Year %s completed: %d succeeded (%d unchanged, %d linked), %d failed.",
+                         year, ok_count, cached_count, linked_count, len(results) - ok_count)
+        return {"year": year, "source_page": page_url, "results": results}
+
+    with ThreadPoolExecutor(max_workers=min(8, len(years))) as executor:
+        all_results = list(executor.map(process_year, years))
 
     # write top-level summary
     if not args.no_metadata:
         summary_file = out_dir / "summary.json"
-        with open(summary_file, "w", encoding="utf-8") as fh:
-            json.dump({"years": years, "fetched_at": int(time.time()), "data": all_results}, fh, ensure_ascii=False, indent=2)
+        summary_file.write_bytes(dump_json({"years": years, "fetched_at": int(time.time()), "data": all_results}))
         logging.info("All done. Summary: %s", summary_file)
     else:
         logging.info("All done.")
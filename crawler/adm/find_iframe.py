@@ -4,43 +4,54 @@ Utility script to find iframe URLs in web pages.
 Useful for discovering the actual content URL when pages use iframes.
 
 Usage:
-    python find_iframe.py <url>
+    python find_iframe.py <url> [<url> ...]
     python find_iframe.py https://pdc.adm.ncu.edu.tw/form_course.asp
     python find_iframe.py https://pdc.adm.ncu.edu.tw/form_reg.asp --insecure
+    python find_iframe.py https://pdc.adm.ncu.edu.tw/form_course.asp https://pdc.adm.ncu.edu.tw/form_reg.asp --insecure
 """
 
 import argparse
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urljoin
 
 import certifi
 import requests
 from bs4 import BeautifulSoup
 
+# Prefer the C-based lxml parser when it is installed
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
 
-def find_iframes(url: str, insecure: bool = False) -> list:
+
+def find_iframes(url: str, insecure: bool = False, session: requests.Session = None, emit=print) -> list:
     """
     Fetch a URL and extract all iframe sources.
     Returns a list of absolute iframe URLs.
+    Output goes through emit (print-compatible), so concurrent callers can
+    collect it and print each page's report in one piece.
     """
     try:
         verify_arg = False if insecure else certifi.where()
         
-        print(f"Fetching: {url}")
-        r = requests.get(url, verify=verify_arg, timeout=30)
+        emit(f"Fetching: {url}")
+        r = (session or requests).get(url, verify=verify_arg, timeout=30)
         
         # Try to detect encoding (common for Chinese websites)
         r.encoding = r.apparent_encoding or 'big5'
         r.raise_for_status()
         
-        soup = BeautifulSoup(r.text, 'html.parser')
+        soup = BeautifulSoup(r.text, HTML_PARSER)
         iframes = soup.find_all('iframe')
         
         if not iframes:
-            print("❌ No iframes found on the page")
+            emit("❌ No iframes found on the page")
             return []
         
-        print(f"✅ Found {len(iframes)} iframe(s)\n")
+        emit(f"✅ Found {len(iframes)} iframe(s)\n")
         
         results = []
         for i, iframe in enumerate(iframes, 1):
@@ -49,30 +60,40 @@ def find_iframes(url: str, insecure: bool = False) -> list:
                 abs_url = urljoin(url, src)
                 results.append(abs_url)
                 
-                print(f"Iframe #{i}:")
-                print(f"  Relative: {src}")
-                print(f"  Absolute: {abs_url}")
+                emit(f"Iframe #{i}:")
+                emit(f"  Relative: {src}")
+                emit(f"  Absolute: {abs_url}")
                 
                 # Show other attributes if present
                 if iframe.get('width') or iframe.get('height'):
-                    print(f"  Size: {iframe.get('width', '?')} x {iframe.get('height', '?')}")
+                    emit(f"  Size: {iframe.get('width', '?')} x {iframe.get('height', '?')}")
                 if iframe.get('title'):
-                    print(f"  Title: {iframe.get('title')}")
-                print()
+                    emit(f"  Title: {iframe.get('title')}")
+                emit()
             else:
-                print(f"Iframe #{i}: (no src attribute)")
-                print()
+                emit(f"Iframe #{i}: (no src attribute)")
+                emit()
         
         return results
         
     except requests.RequestException as e:
-        print(f"❌ Error fetching URL: {e}", file=sys.stderr)
+        emit(f"❌ Error fetching URL: {e}", file=sys.stderr)
         return []
     except Exception as e:
-        print(f"❌ Error: {e}", file=sys.stderr)
+        emit(f"❌ Error: {e}", file=sys.stderr)
         return []
 
 
+def collect_iframes(url: str, insecure: bool, session: requests.Session) -> tuple:
+    """Run find_iframes for one URL, buffering its output instead of printing it."""
+    lines = []
+
+    def emit(*args, file=sys.stdout, **kwargs):
+        lines.append((" ".join(str(a) for a in args), file))
+
+    return find_iframes(url, insecure=insecure, session=session, emit=emit), lines
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Find iframe URLs in web pages",
@@ -81,6 +102,7 @@ def main():
 Examples:
   python find_iframe.py https://pdc.adm.ncu.edu.tw/form_course.asp --insecure
   python find_iframe.py https://pdc.adm.ncu.edu.tw/form_reg.asp --insecure
+  python find_iframe.py https://pdc.adm.ncu.edu.tw/form_course.asp https://pdc.adm.ncu.edu.tw/form_reg.asp --insecure
   
 Common NCU Admin Pages:
   - Course Forms:        https://pdc.adm.ncu.edu.tw/form_course.asp
@@ -88,7 +110,7 @@ Common NCU Admin Pages:
   - Statistics:          https://pdc.adm.ncu.edu.tw/rate_note_reg1.asp
         """
     )
-    parser.add_argument('url', help='URL of the page to check for iframes')
+    parser.add_argument('url', nargs='+', help='URL(s) of the page(s) to check for iframes')
     parser.add_argument('--insecure', action='store_true',
                         help='Disable SSL certificate verification')
     
@@ -102,7 +124,17 @@ Common NCU Admin Pages:
         except ImportError:
             pass
     
-    iframes = find_iframes(args.url, insecure=args.insecure)
+    # Pages are fetched side by side over one session; each report is
+    # printed whole and in the order the URLs were given
+    session = requests.Session()
+    with ThreadPoolExecutor(max_workers=min(8, len(args.url))) as executor:
+        reports = list(executor.map(lambda u: collect_iframes(u, args.insecure, session), args.url))
+    
+    iframes = []
+    for found, lines in reports:
+        for line, file in lines:
+            print(line, file=file)
+        iframes.extend(found)
     
     if iframes:
         print("=" * 60)
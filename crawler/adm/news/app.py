@@ -1,7 +1,12 @@
 import requests
-from bs4 import BeautifulSoup
+try:
+    from requests_cache import CachedSession
+except ImportError:
+    CachedSession = None
+from selectolax.parser import HTMLParser
 import csv
 import os
+import sys
 
 
 URL = "https://pdc.adm.ncu.edu.tw/"
@@ -10,22 +15,34 @@ URL = "https://pdc.adm.ncu.edu.tw/"
 CSV_FILENAME = 'docs/news.csv'
 CSV_HEADER = ['日期', '分類', '標題', '連結']
 
+# print every scraped row only when asked to (python3 app.py --verbose)
+VERBOSE = '--verbose' in sys.argv
+
+# the news index is cached locally for an hour unless run with --no-cache
+CACHE_FILENAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'page_cache.sqlite')
+
 
 all_news_data = []
 
 print(f"正在嘗試爬取: {URL}")
 
 try:
-    response = requests.get(URL, verify=False)
+    if CachedSession is not None and '--no-cache' not in sys.argv:
+        http = CachedSession(CACHE_FILENAME, expire_after=3600, allowable_codes=(200,))
+    else:
+        http = requests
+    response = http.get(URL, verify=False)
     response.raise_for_status() 
     response.encoding = 'big5'
     
     print("成功取得網頁內容！")
     print("\n--- 開始爬取最新消息 ---\n")
 
-    soup = BeautifulSoup(response.text, 'html.parser')
+    tree = HTMLParser(response.text)
     
-    marker_cells = soup.find_all('td', width='80')
+    # a td always sits directly in its tr once parsed, so the child
+    # combinator hands back the marker cells and their rows in one pass
+    marker_cells = tree.css('tr > td[width="80"]')
     
     if not marker_cells:
         print("找不到任何新聞標記 (td width='80')。")
@@ -33,23 +50,21 @@ try:
         print(f"成功定位到 {len(marker_cells)} 則新聞項目。\n")
         
         for marker_cell in marker_cells:
-            row = marker_cell.find_parent('tr')
-            if not row:
-                continue
-                
-            cells = row.find_all('td')
+            cells = marker_cell.parent.css('td')
             
             if len(cells) == 3:
-                date = cells[0].get_text(strip=True)
-                category = cells[1].get_text(strip=True)
-                link_tag = cells[2].find('a')
+                date_cell, category_cell, link_cell = cells
+                link_tag = link_cell.css_first('a')
                 
-                if link_tag:
-                    title = link_tag.get_text(strip=True)
-                    link = link_tag.get('href')
+                if link_tag is not None:
+                    date = date_cell.text(strip=True)
+                    category = category_cell.text(strip=True)
+                    title = link_tag.text(strip=True)
+                    link = link_tag.attributes.get('href')
                     
 
-                    print(f"日期: {date}, 分類: {category}, 標題: {title}")
+                    if VERBOSE:
+                        print(f"日期: {date}, 分類: {category}, 標題: {title}")
                     
                     row_data = [date, category, title, link]
                     
@@ -60,7 +75,7 @@ try:
         
         try:
             os.makedirs(os.path.dirname(CSV_FILENAME), exist_ok=True)
-            with open(CSV_FILENAME, 'w', newline='', encoding='utf-8-sig') as file:
+            with open(CSV_FILENAME, 'w', newline='', encoding='utf-8-sig', buffering=1 << 20) as file:
                 
                 writer = csv.writer(file)
                 
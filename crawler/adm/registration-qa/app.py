@@ -9,43 +9,89 @@ It downloads linked files (by extension) into the outdir and writes a metadata.j
 from __future__ import annotations
 
 import argparse
-import hashlib
 import json
 import logging
 import os
 import re
+import secrets
+import shutil
+import ssl
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List
 from urllib.parse import urljoin, urlparse, unquote
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as Urllib3Error
+from urllib3.util import make_headers
+from urllib3.util.retry import Retry
 try:
     import certifi
 except ImportError:
     certifi = None
-from bs4 import BeautifulSoup
+try:
+    from requests_cache import CachedSession
+except ImportError:
+    CachedSession = None
+from selectolax.parser import HTMLParser
 
 
 DEFAULT_EXTENSIONS = ["pdf"]
 
 
+class SSLContextAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose connection pools all share one pre-built SSLContext, so
+    the CA bundle is parsed once per run instead of once per new connection.
+    Requests must then be sent with verify=True (not a bundle path), which
+    requests >= 2.32 honours without reloading the CA file.
+    """
+
+    def __init__(self, ssl_context: ssl.SSLContext | None = None, **kwargs):
+        self.ssl_context = ssl_context
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.ssl_context is not None:
+            kwargs["ssl_context"] = self.ssl_context
+        return super().init_poolmanager(*args, **kwargs)
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        if self.ssl_context is not None:
+            proxy_kwargs["ssl_context"] = self.ssl_context
+        return super().proxy_manager_for(proxy, **proxy_kwargs)
+
+
+def build_page_session(session: requests.Session, cache_path: Path) -> requests.Session:
+    """
+    Session for the index page: a requests-cache CachedSession that shares
+    the download session's headers and adapters, or the session itself when
+    requests-cache is not installed. Downloads stay on the plain session so
+    files never end up in the cache.
+    """
+    if CachedSession is None:
+        return session
+    cached = CachedSession(str(cache_path), expire_after=3600, allowable_codes=(200,))
+    cached.headers.update(session.headers)
+    for prefix, adapter in session.adapters.items():
+        cached.mount(prefix, adapter)
+    return cached
+
+
 def safe_filename(name: str) -> str:
-    name = name.split("?")[0].split("#")[0]
-    name = unquote(name)
-    name = name.replace("/", "_")
-    name = name.strip()
-    if not name:
-        name = hashlib.sha1(os.urandom(16)).hexdigest()
-    return name
-
-
-def extract_iframe_src(html: str, base: str) -> str:
-    """Extract the first iframe src attribute if present."""
-    soup = BeautifulSoup(html, "html.parser")
-    iframe = soup.find("iframe", src=True)
-    if iframe:
-        return urljoin(base, iframe["src"])
+    # strip query and fragment, then keep the name on one path level
+    name = unquote(name.split("?", 1)[0].split("#", 1)[0]).replace("/", "_").strip()
+    # fallback to a random token
+    return name or secrets.token_hex(20)
+
+
+def extract_iframe_src(tree: HTMLParser, base: str) -> str:
+    """Extract the first iframe src attribute of a parsed page if present."""
+    iframe = tree.css_first("iframe[src]")
+    if iframe is not None:
+        return urljoin(base, iframe.attributes.get("src") or "")
     return None
 
 
@@ -60,11 +106,10 @@ def is_valid_link(href: str) -> bool:
     return True
 
 
-def extract_links(html: str, base: str) -> List[str]:
-    soup = BeautifulSoup(html, "html.parser")
+def extract_links(tree: HTMLParser, base: str) -> List[str]:
     links: List[str] = []
-    for a in soup.find_all("a", href=True):
-        href = a["href"]
+    for a in tree.css("a[href]"):
+        href = a.attributes.get("href")
         if not is_valid_link(href):
             continue
         full = urljoin(base, href)
@@ -72,25 +117,25 @@ def extract_links(html: str, base: str) -> List[str]:
     return links
 
 
-def has_allowed_ext(url: str, allowed: List[str]) -> bool:
-    parsed = urlparse(url)
-    path = parsed.path.lower()
-    for ext in allowed:
-        if path.endswith("." + ext.lower()):
-            return True
-    return False
+def build_extension_pattern(extensions: list) -> "re.Pattern":
+    """Compile one regex matching any of the extensions at the end of a URL path."""
+    alternatives = "|".join(re.escape(ext.lstrip(".")) for ext in extensions)
+    return re.compile(r"\.(?:" + alternatives + r")(?:$|[?#])", re.IGNORECASE)
+
+
+def has_allowed_ext(url: str, ext_pattern: "re.Pattern") -> bool:
+    return ext_pattern.search(url) is not None
 
 
-def download_file(session: requests.Session, url: str, dest: Path, max_retries: int = 3, verify=True) -> dict:
+def download_file(session: requests.Session, url: str, dest: Path, verify=True) -> dict:
+    # retries and backoff are handled by the session's HTTPAdapter
     record = {"url": url, "ok": False, "filename": None, "reason": None}
-    for attempt in range(1, max_retries + 1):
-        try:
-            resp = session.get(url, stream=True, timeout=20, verify=verify)
+    try:
+        with session.get(url, stream=True, timeout=20, verify=verify) as resp:
             if resp.status_code != 200:
                 record["reason"] = f"status_{resp.status_code}"
                 logging.debug("Non-200 for %s: %s", url, resp.status_code)
-                time.sleep(1)
-                continue
+                return record
 
             parsed = urlparse(url)
             name = os.path.basename(parsed.path)
@@ -102,32 +147,30 @@ def download_file(session: requests.Session, url: str, dest: Path, max_retries:
 
             outpath = dest / name
 
-            if outpath.exists():
-                stem = outpath.stem
-                suffix = outpath.suffix
-                i = 1
-                while True:
-                    candidate = dest / f"{stem}_{i}{suffix}"
-                    if not candidate.exists():
-                        outpath = candidate
-                        break
+            # O_EXCL makes the create itself the collision check; on a clash try
+            # name_1, name_2, ... until one is free
+            stem, suffix = outpath.stem, outpath.suffix
+            i = 0
+            while True:
+                try:
+                    fd = os.open(outpath, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+                    break
+                except FileExistsError:
                     i += 1
+                    outpath = dest / f"{stem}_{i}{suffix}"
 
-            with open(outpath, "wb") as fh:
-                for chunk in resp.iter_content(chunk_size=8192):
-                    if chunk:
-                        fh.write(chunk)
+            # let urllib3 undo any Content-Encoding, then copy in large blocks
+            resp.raw.decode_content = True
+            with os.fdopen(fd, "wb", buffering=0) as fh:
+                shutil.copyfileobj(resp.raw, fh, 1 << 18)
 
-            record.update({"ok": True, "filename": str(outpath), "reason": None})
-            return record
-
-        except requests.RequestException as e:
-            record["reason"] = str(e)
-            logging.debug("Attempt %s failed for %s: %s", attempt, url, e)
-            time.sleep(1)
-            continue
+        record.update({"ok": True, "filename": str(outpath), "reason": None})
+        return record
 
-    return record
+    except (requests.RequestException, Urllib3Error) as e:
+        record["reason"] = str(e)
+        logging.debug("Download failed for %s: %s", url, e)
+        return record
 
 
 def main(argv=None):
@@ -141,12 +184,14 @@ def main(argv=None):
     parser.add_argument("--insecure", action="store_true", help="Disable SSL certificate verification (insecure)")
     parser.add_argument("--ca-bundle", required=False, help="Path to a custom CA bundle file to use for verification", default=None)
     parser.add_argument("--no-metadata", action="store_true", help="Do not write the metadata.json file")
+    parser.add_argument("--no-cache", action="store_true", help="Always fetch the index page from the server")
+    parser.add_argument("--jobs", type=int, required=False, help="Number of concurrent downloads", default=8)
     args = parser.parse_args(argv)
 
     logging.basicConfig(level=logging.INFO if not args.quiet else logging.WARNING,
                         format="%(levelname)s: %(message)s")
 
-    allowed = [e.strip().lower() for e in args.extensions.split(",") if e.strip()]
+    allowed = build_extension_pattern([e.strip() for e in args.extensions.split(",") if e.strip()])
 
     base_dir = Path(__file__).resolve().parent
     out_dir = base_dir / args.outdir
@@ -154,33 +199,47 @@ def main(argv=None):
 
     session = requests.Session()
     session.headers.update({
-        "User-Agent": "ncu-campus-qa-bot/1.0 (+https://github.com/)"
+        "User-Agent": "ncu-campus-qa-bot/1.0 (+https://github.com/)",
+        # gzip/deflate, plus br when the brotli package is installed
+        "Accept-Encoding": make_headers(accept_encoding=True)["accept-encoding"],
     })
-
+    # certificates come from one shared SSLContext, loaded once per run
     if args.insecure:
         verify = False
+        ssl_context = None
         try:
             import urllib3
             urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
         except Exception:
             pass
-    elif args.ca_bundle:
-        verify = args.ca_bundle
     else:
-        verify = certifi.where() if certifi is not None else True
+        verify = True
+        cafile = args.ca_bundle or (certifi.where() if certifi is not None else None)
+        ssl_context = ssl.create_default_context(cafile=cafile)
+    # exponential backoff on transient failures; 429/503 wait as long as Retry-After asks
+    retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                    allowed_methods={"GET", "HEAD"}, respect_retry_after_header=True)
+    adapter = SSLContextAdapter(ssl_context=ssl_context, pool_connections=32, pool_maxsize=max(64, args.jobs),
+                                max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    # the index page rarely changes, so it may come from a local cache
+    page_session = session if args.no_cache else build_page_session(session, base_dir / "page_cache.sqlite")
 
     page_url = args.url
     logging.info("Fetching page: %s", page_url)
     try:
-        r = session.get(page_url, timeout=20, verify=verify)
+        r = page_session.get(page_url, timeout=20, verify=verify)
         r.raise_for_status()
         r.encoding = r.apparent_encoding or 'big5'
     except requests.RequestException as e:
         logging.error("Failed to fetch %s: %s", page_url, e)
         return
 
+    # parse once; the same tree serves the iframe lookup and the link scan
+    tree = HTMLParser(r.text)
     links = []
-    iframe_src = extract_iframe_src(r.text, page_url)
+    iframe_src = extract_iframe_src(tree, page_url)
     if iframe_src:
         logging.info("Found iframe with src: %s", iframe_src)
         # If the iframe src is a downloadable file, treat it as the only link
@@ -190,34 +249,28 @@ def main(argv=None):
             # Otherwise, fetch the iframe content and parse for links
             logging.info("Fetching iframe content from %s", iframe_src)
             try:
-                r_iframe = session.get(iframe_src, timeout=20, verify=verify)
+                r_iframe = page_session.get(iframe_src, timeout=20, verify=verify)
                 r_iframe.raise_for_status()
                 r_iframe.encoding = r_iframe.apparent_encoding or 'big5'
-                links = extract_links(r_iframe.text, iframe_src)
+                links = extract_links(HTMLParser(r_iframe.text), iframe_src)
             except requests.RequestException as e:
                 logging.error("Failed to fetch iframe %s: %s", iframe_src, e)
                 return
     else:
-        links = extract_links(r.text, page_url)
+        links = extract_links(tree, page_url)
 
     logging.info("Found %d links to process", len(links))
 
-    to_download = []
-    seen = set()
-    for link in links:
-        if link in seen:
-            continue
-        seen.add(link)
-        if has_allowed_ext(link, allowed):
-            to_download.append(link)
+    to_download = [link for link in dict.fromkeys(links) if has_allowed_ext(link, allowed)]
 
     logging.info("Will download %d files (matching extensions)", len(to_download))
 
-    results = []
-    for url in to_download:
+    def fetch(url):
         logging.info("Downloading %s", url)
-        rec = download_file(session, url, out_dir, verify=verify)
-        results.append(rec)
+        return download_file(session, url, out_dir, verify=verify)
+
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        results = list(executor.map(fetch, to_download))
 
     ok_count = sum(1 for r in results if r.get("ok"))
     if not args.no_metadata:
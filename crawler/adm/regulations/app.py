@@ -12,36 +12,86 @@ import argparse
 import json
 import logging
 import os
+import re
+import shutil
+import ssl
 import sys
 import time
-import hashlib
+import secrets
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List
 from urllib.parse import urljoin, urlparse, unquote
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as Urllib3Error
+from urllib3.util import make_headers
+from urllib3.util.retry import Retry
 try:
     import certifi
 except Exception:
     certifi = None
-from bs4 import BeautifulSoup
+try:
+    from requests_cache import CachedSession
+except ImportError:
+    CachedSession = None
+from selectolax.parser import HTMLParser
+
+# ".pdf" ending the URL path, optionally followed by a query or fragment
+_PDF_RE = re.compile(r"\.pdf(?:$|[?#])", re.IGNORECASE)
+
+
+class SSLContextAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose connection pools all share one pre-built SSLContext, so
+    the CA bundle is parsed once per run instead of once per new connection.
+    Requests must then be sent with verify=True (not a bundle path), which
+    requests >= 2.32 honours without reloading the CA file.
+    """
+
+    def __init__(self, ssl_context: ssl.SSLContext | None = None, **kwargs):
+        self.ssl_context = ssl_context
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.ssl_context is not None:
+            kwargs["ssl_context"] = self.ssl_context
+        return super().init_poolmanager(*args, **kwargs)
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        if self.ssl_context is not None:
+            proxy_kwargs["ssl_context"] = self.ssl_context
+        return super().proxy_manager_for(proxy, **proxy_kwargs)
+
+
+def build_page_session(session: requests.Session, cache_path: Path) -> requests.Session:
+    """
+    Session for the index page: a requests-cache CachedSession that shares
+    the download session's headers and adapters, or the session itself when
+    requests-cache is not installed. Downloads stay on the plain session so
+    files never end up in the cache.
+    """
+    if CachedSession is None:
+        return session
+    cached = CachedSession(str(cache_path), expire_after=3600, allowable_codes=(200,))
+    cached.headers.update(session.headers)
+    for prefix, adapter in session.adapters.items():
+        cached.mount(prefix, adapter)
+    return cached
 
 
 def safe_filename(name: str) -> str:
-    name = name.split("?")[0].split("#")[0]
-    name = unquote(name)
-    name = name.replace("/", "_")
-    name = name.strip()
-    if not name:
-        name = hashlib.sha1(os.urandom(16)).hexdigest()
-    return name
+    # strip query and fragment, then keep the name on one path level
+    name = unquote(name.split("?", 1)[0].split("#", 1)[0]).replace("/", "_").strip()
+    # fallback to a random token
+    return name or secrets.token_hex(20)
 
 
 def extract_links(html: str, base: str) -> List[str]:
-    soup = BeautifulSoup(html, "html.parser")
     links: List[str] = []
-    for a in soup.find_all("a", href=True):
-        href = a["href"].strip()
+    for a in HTMLParser(html).css("a[href]"):
+        href = (a.attributes.get("href") or "").strip()
         if not href or href.startswith("javascript:") or href.startswith("#"):
             continue
         links.append(urljoin(base, href))
@@ -49,10 +99,7 @@ def extract_links(html: str, base: str) -> List[str]:
 
 
 def is_pdf_link(url: str) -> bool:
-    p = urlparse(url)
-    if p.path.lower().endswith(".pdf"):
-        return True
-    return False
+    return _PDF_RE.search(url) is not None
 
 
 def download_file(session: requests.Session, url: str, dest: Path, verify=True) -> dict:
@@ -60,6 +107,7 @@ def download_file(session: requests.Session, url: str, dest: Path, verify=True)
     try:
         resp = session.get(url, stream=True, timeout=20, verify=verify)
         if resp.status_code != 200:
+            resp.close()
             rec["reason"] = f"status_{resp.status_code}"
             return rec
 
@@ -73,26 +121,27 @@ def download_file(session: requests.Session, url: str, dest: Path, verify=True)
                 name = name + ".pdf"
 
         outpath = dest / name
-        if outpath.exists():
-            stem = outpath.stem
-            suffix = outpath.suffix
-            i = 1
-            while True:
-                candidate = dest / f"{stem}_{i}{suffix}"
-                if not candidate.exists():
-                    outpath = candidate
-                    break
+        # O_EXCL makes the create itself the collision check; on a clash try
+        # name_1, name_2, ... until one is free
+        stem, suffix = outpath.stem, outpath.suffix
+        i = 0
+        while True:
+            try:
+                fd = os.open(outpath, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+                break
+            except FileExistsError:
                 i += 1
+                outpath = dest / f"{stem}_{i}{suffix}"
 
-        with open(outpath, "wb") as fh:
-            for chunk in resp.iter_content(chunk_size=8192):
-                if chunk:
-                    fh.write(chunk)
+        # let urllib3 undo any Content-Encoding, then copy in large blocks
+        resp.raw.decode_content = True
+        with os.fdopen(fd, "wb", buffering=0) as fh:
+            shutil.copyfileobj(resp.raw, fh, 1 << 18)
 
         rec.update({"ok": True, "filename": str(outpath)})
         return rec
 
-    except requests.RequestException as e:
+    except (requests.RequestException, Urllib3Error) as e:
         rec["reason"] = str(e)
         return rec
 
@@ -103,6 +152,8 @@ def main(argv=None):
     parser.add_argument("--outdir", required=False, default="docs")
     parser.add_argument("--insecure", action="store_true")
     parser.add_argument("--no-metadata", action="store_true", help="Do not write the metadata.json file")
+    parser.add_argument("--no-cache", action="store_true", help="Always fetch the index page from the server")
+    parser.add_argument("--jobs", type=int, required=False, help="Number of concurrent downloads", default=8)
     args = parser.parse_args(argv)
 
     logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
@@ -112,16 +163,30 @@ def main(argv=None):
     out_dir.mkdir(parents=True, exist_ok=True)
 
     session = requests.Session()
-    session.headers.update({"User-Agent": "ncu-campus-qa-bot/1.0"})
-
+    session.headers.update({
+        "User-Agent": "ncu-campus-qa-bot/1.0",
+        # gzip/deflate, plus br when the brotli package is installed
+        "Accept-Encoding": make_headers(accept_encoding=True)["accept-encoding"],
+    })
+    # certificates come from one shared SSLContext, loaded once per run
+    verify = not args.insecure
     if args.insecure:
-        verify = False
+        ssl_context = None
     else:
-        verify = certifi.where() if certifi is not None else True
+        ssl_context = ssl.create_default_context(cafile=certifi.where() if certifi is not None else None)
+    # exponential backoff on transient failures; 429/503 wait as long as Retry-After asks
+    retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                    allowed_methods={"GET", "HEAD"}, respect_retry_after_header=True)
+    adapter = SSLContextAdapter(ssl_context=ssl_context, pool_connections=32, pool_maxsize=max(64, args.jobs),
+                                max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    # the index page rarely changes, so it may come from a local cache
+    page_session = session if args.no_cache else build_page_session(session, base_dir / "page_cache.sqlite")
 
     logging.info("Fetching %s", args.url)
     try:
-        r = session.get(args.url, timeout=20, verify=verify)
+        r = page_session.get(args.url, timeout=20, verify=verify)
         r.raise_for_status()
     except requests.RequestException as e:
         logging.error("Failed to fetch %s: %s", args.url, e)
@@ -131,11 +196,12 @@ def main(argv=None):
     pdf_links = [l for l in links if is_pdf_link(l)]
     logging.info("Found %d PDF links", len(pdf_links))
 
-    results = []
-    for url in pdf_links:
+    def fetch(url):
         logging.info("Downloading %s", url)
-        rec = download_file(session, url, out_dir, verify=verify)
-        results.append(rec)
+        return download_file(session, url, out_dir, verify=verify)
+
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        results = list(executor.map(fetch, pdf_links))
 
     ok = sum(1 for r in results if r.get("ok"))
     if not args.no_metadata:
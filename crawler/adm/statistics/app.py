@@ -18,18 +18,30 @@ import re
 import sys
 import time
 import hashlib
+import io
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
 from pathlib import Path
-from typing import List
-from urllib.parse import urljoin, urlparse, unquote
+from typing import Iterator
+from urllib.parse import urljoin, unquote
 import shutil
+import ssl
 import subprocess
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as Urllib3Error
+from urllib3.util.retry import Retry
 try:
     import certifi
 except Exception:
     certifi = None
+try:
+    import orjson
+except ImportError:
+    orjson = None
 from bs4 import BeautifulSoup
+from lxml import etree
 
 # Optional conversion dependencies
 try:
@@ -38,6 +50,13 @@ try:
 except ImportError:
     HAS_PANDAS = False
 
+# Rust-based Excel reader; pandas >= 2.2 uses it through engine="calamine"
+try:
+    import python_calamine  # noqa: F401
+    HAS_CALAMINE = True
+except ImportError:
+    HAS_CALAMINE = False
+
 try:
     from weasyprint import HTML as WeasyprintHTML
     HAS_WEASYPRINT = True
@@ -73,6 +92,37 @@ DEFAULT_EXTENSIONS = [
     "html",
 ]
 
+# the page number just before ".asp" (or at the end), e.g. rate_note_reg1.asp
+_URL_N_RE = re.compile(r"(.*?)(\d+)(\.asp.*|$)")
+# characters not allowed in a per-sheet CSV name
+_SHEET_SANITIZE_RE = re.compile(r"[^\w\-]")
+# charset=... in a Content-Type header or a <meta> tag
+_CHARSET_RE = re.compile(r"charset\s*=\s*[\"']?([\w-]+)", re.IGNORECASE)
+_META_CHARSET_RE = re.compile(rb"charset\s*=\s*[\"']?([\w-]+)", re.IGNORECASE)
+
+
+class SSLContextAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose connection pools all share one pre-built SSLContext, so
+    the CA bundle is parsed once per run instead of once per new connection.
+    Requests must then be sent with verify=True (not a bundle path), which
+    requests >= 2.32 honours without reloading the CA file.
+    """
+
+    def __init__(self, ssl_context: ssl.SSLContext | None = None, **kwargs):
+        self.ssl_context = ssl_context
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.ssl_context is not None:
+            kwargs["ssl_context"] = self.ssl_context
+        return super().init_poolmanager(*args, **kwargs)
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        if self.ssl_context is not None:
+            proxy_kwargs["ssl_context"] = self.ssl_context
+        return super().proxy_manager_for(proxy, **proxy_kwargs)
+
 
 def safe_filename(name: str) -> str:
     name = name.split("?")[0].split("#")[0]
@@ -84,72 +134,189 @@ def safe_filename(name: str) -> str:
     return name
 
 
-def extract_iframe_src(html: str, base: str) -> str:
-    """Extract the first iframe src attribute if present."""
-    soup = BeautifulSoup(html, "html.parser")
-    iframe = soup.find("iframe", src=True)
-    if iframe:
-        return urljoin(base, iframe["src"])
-    return None
+def iter_attributes(content: bytes, encoding: str | None, wanted: dict) -> Iterator[tuple]:
+    """
+    Yield (tag, value) for every element whose tag is a key of wanted
+    (tag -> attribute name) and carries that attribute, in document order.
 
+    The page is parsed incrementally with lxml's iterparse, and each
+    element (with the siblings before it) is dropped once read, so only a
+    sliver of the tree is ever in memory. lxml decodes the bytes itself:
+    with encoding, or from the page's <meta charset> when it is None.
+    """
+    if not content or not content.strip():
+        return
+    try:
+        context = etree.iterparse(io.BytesIO(content), events=("end",), tag=tuple(wanted), html=True,
+                                  encoding=encoding)
+        for _, el in context:
+            value = el.get(wanted[el.tag])
+            if value is not None:
+                yield el.tag, value
+            el.clear(keep_tail=True)
+            while el.getprevious() is not None:
+                del el.getparent()[0]
+    except LookupError:
+        # an encoding name libxml2 does not know: let it sniff the page instead
+        if encoding is not None:
+            yield from iter_attributes(content, None, wanted)
+    except etree.XMLSyntaxError:
+        return
+
+
+def parse_page(content: bytes, encoding: str | None, base: str, suffixes: tuple) -> tuple:
+    """
+    Walk the page once and return (iframe_src, links).
 
-def extract_links(html: str, base: str) -> List[str]:
-    soup = BeautifulSoup(html, "html.parser")
-    links: List[str] = []
-    for a in soup.find_all("a", href=True):
-        href = a["href"].strip()
+    iframe_src is the absolute src of the first <iframe>, or None. links is
+    a list of (url, filename) for each distinct absolute link whose path
+    ends with one of suffixes (lowercase, dot included, e.g. (".pdf",)), in
+    page order; filename is the sanitized last path segment, taken from the
+    same split, so nobody has to urlparse the URL again.
+    """
+    iframe_src = None
+    links = []
+    seen = set()
+    for tag, value in iter_attributes(content, encoding, {"iframe": "src", "a": "href"}):
+        if tag == "iframe":
+            if iframe_src is None:
+                iframe_src = urljoin(base, value)
+            continue
+        href = value.strip()
         if not href or href.startswith("javascript:") or href.startswith("#"):
             continue
-        links.append(urljoin(base, href))
-    return links
+        path = href.split("?", 1)[0].split("#", 1)[0]
+        if not path.lower().endswith(suffixes):
+            continue
+        url = urljoin(base, href)
+        if url not in seen:
+            seen.add(url)
+            links.append((url, safe_filename(path.rsplit("/", 1)[-1])))
+    return iframe_src, links
 
 
-def has_allowed_ext(url: str, allowed: List[str]) -> bool:
-    parsed = urlparse(url)
-    path = parsed.path.lower()
-    for ext in allowed:
-        if path.endswith("." + ext.lower()):
-            return True
-    return False
+def dump_json(obj) -> bytes:
+    """Serialize obj as indented UTF-8 JSON, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
 
 
-def download_file(session: requests.Session, url: str, dest: Path, verify=True) -> dict:
-    rec = {"url": url, "ok": False, "filename": None, "reason": None}
+CACHE_INDEX_NAME = ".cache_index.json"
+
+
+def load_cache_index(dest: Path) -> dict:
+    """Return the validators saved by the last run for files in dest, keyed by URL."""
     try:
-        resp = session.get(url, stream=True, timeout=20, verify=verify)
-        if resp.status_code != 200:
-            rec["reason"] = f"status_{resp.status_code}"
+        with open(dest / CACHE_INDEX_NAME, "r", encoding="utf-8") as fh:
+            index = json.load(fh)
+        return index if isinstance(index, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache_index(dest: Path, index: dict) -> None:
+    # write to a temp file and swap it in, so an interrupted run never leaves half a file
+    tmp = dest / (CACHE_INDEX_NAME + ".tmp")
+    tmp.write_bytes(dump_json(index))
+    os.replace(tmp, dest / CACHE_INDEX_NAME)
+
+
+def find_existing_copy(session: requests.Session, url: str, dest: Path, name: str, verify=True) -> dict | None:
+    """
+    For a URL with no saved validators, check whether the file called name
+    in dest is already the current version: a HEAD whose Content-Length equals
+    its size and whose Last-Modified (when sent) is not newer than the file.
+    Returns the fields to merge into the record, or None to download it.
+    """
+    existing = dest / name
+    if not existing.is_file():
+        return None
+    try:
+        # identity, so Content-Length is the size of the file we would write
+        head = session.head(url, headers={"Accept-Encoding": "identity"}, allow_redirects=True,
+                            timeout=10, verify=verify)
+        length = int(head.headers.get("Content-Length", ""))
+    except (requests.RequestException, ValueError):
+        return None
+    stat = existing.stat()
+    if head.status_code != 200 or stat.st_size != length:
+        return None
+    last_modified = head.headers.get("Last-Modified")
+    if last_modified:
+        try:
+            if parsedate_to_datetime(last_modified).timestamp() > stat.st_mtime:
+                return None
+        except (TypeError, ValueError):
+            pass
+    return {"ok": True, "filename": str(existing), "reason": "already_downloaded",
+            "etag": head.headers.get("ETag"), "last_modified": last_modified}
+
+
+def download_file(session: requests.Session, url: str, dest: Path, *, filename_hint: str, verify=True,
+                  cached: dict | None = None) -> dict:
+    rec = {"url": url, "ok": False, "filename": None, "reason": None, "etag": None, "last_modified": None}
+
+    # A file from the last run is revalidated and, if it changed, overwritten in place
+    known_path = None
+    headers = {}
+    if cached and cached.get("filename") and Path(cached["filename"]).is_file():
+        known_path = Path(cached["filename"])
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+    else:
+        existing = find_existing_copy(session, url, dest, filename_hint, verify=verify)
+        if existing is not None:
+            rec.update(existing)
             return rec
 
-        parsed = urlparse(url)
-        name = os.path.basename(parsed.path)
-        name = safe_filename(name)
-        if not Path(name).suffix:
-            ctype = resp.headers.get("content-type", "")
-            if "pdf" in ctype:
-                name = name + ".pdf"
-
-        outpath = dest / name
-        if outpath.exists():
-            stem = outpath.stem
-            suffix = outpath.suffix
-            i = 1
-            while True:
-                candidate = dest / f"{stem}_{i}{suffix}"
-                if not candidate.exists():
-                    outpath = candidate
-                    break
-                i += 1
+    try:
+        with session.get(url, headers=headers, stream=True, timeout=20, verify=verify) as resp:
+            if resp.status_code == 304 and known_path is not None:
+                rec.update({"ok": True, "filename": str(known_path), "reason": "not_modified",
+                            "etag": cached.get("etag"), "last_modified": cached.get("last_modified")})
+                return rec
+            if resp.status_code != 200:
+                rec["reason"] = f"status_{resp.status_code}"
+                return rec
+
+            rec["etag"] = resp.headers.get("ETag")
+            rec["last_modified"] = resp.headers.get("Last-Modified")
+
+            if known_path is not None:
+                outpath = known_path
+                fd = os.open(outpath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            else:
+                name = filename_hint
+                if not Path(name).suffix:
+                    ctype = resp.headers.get("content-type", "")
+                    if "pdf" in ctype:
+                        name = name + ".pdf"
+
+                outpath = dest / name
+                # downloads run concurrently: O_EXCL makes the create itself the
+                # collision check; on a clash try name_1, name_2, ... until one is free
+                stem, suffix = outpath.stem, outpath.suffix
+                i = 0
+                while True:
+                    try:
+                        fd = os.open(outpath, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+                        break
+                    except FileExistsError:
+                        i += 1
+                        outpath = dest / f"{stem}_{i}{suffix}"
 
-        with open(outpath, "wb") as fh:
-            for chunk in resp.iter_content(chunk_size=8192):
-                if chunk:
-                    fh.write(chunk)
+            # let urllib3 undo any Content-Encoding, then copy in large blocks
+            resp.raw.decode_content = True
+            with os.fdopen(fd, "wb", buffering=0) as fh:
+                shutil.copyfileobj(resp.raw, fh, 1 << 18)
 
         rec.update({"ok": True, "filename": str(outpath)})
         return rec
 
-    except requests.RequestException as e:
+    except (requests.RequestException, Urllib3Error) as e:
         rec["reason"] = str(e)
         return rec
 
@@ -157,6 +324,13 @@ def download_file(session: requests.Session, url: str, dest: Path, verify=True)
 RAG_FRIENDLY_EXTS = {".pdf", ".csv", ".txt"}
 
 
+def write_csv(df, csv_path: Path) -> None:
+    # one large buffer, so pandas' row chunks reach the disk in few writes;
+    # chunksize bounds the formatted text held in memory for huge sheets
+    with open(csv_path, "w", encoding="utf-8", newline="", buffering=1 << 20) as fh:
+        df.to_csv(fh, index=False, chunksize=100_000)
+
+
 def convert_file(filepath: Path, remove_original: bool = False) -> dict:
     """Convert files to RAG-friendly formats.
     
@@ -183,26 +357,34 @@ def convert_file(filepath: Path, remove_original: bool = False) -> dict:
                 result["reason"] = "pandas not installed"
                 return result
             
-            # Select engine based on extension
-            engine = "xlrd" if ext == ".xls" else "openpyxl"
-            try:
-                df = pd.read_excel(filepath, sheet_name=None, engine=engine)  # Read all sheets
-            except Exception as e:
-                result["reason"] = f"read_excel failed: {e}"
+            # Prefer calamine; fall back to the engine matching the extension
+            engines = (["calamine"] if HAS_CALAMINE else []) + ["xlrd" if ext == ".xls" else "openpyxl"]
+            df = None
+            errors = []
+            for engine in engines:
+                try:
+                    # one ExcelFile opens the workbook once for all of its sheets
+                    with pd.ExcelFile(filepath, engine=engine) as xl:
+                        df = {name: xl.parse(name) for name in xl.sheet_names}
+                    break
+                except Exception as e:
+                    errors.append(f"{engine}: {e}")
+            if df is None:
+                result["reason"] = f"read_excel failed: {'; '.join(errors)}"
                 return result
 
             if len(df) == 1:
                 # Single sheet - save as single CSV
                 csv_path = filepath.with_suffix(".csv")
-                list(df.values())[0].to_csv(csv_path, index=False, encoding="utf-8")
+                write_csv(list(df.values())[0], csv_path)
                 result["converted"] = str(csv_path)
             else:
                 # Multiple sheets - save each sheet
                 converted_files = []
                 for sheet_name, sheet_df in df.items():
-                    safe_sheet = re.sub(r'[^\w\-]', '_', sheet_name)
+                    safe_sheet = _SHEET_SANITIZE_RE.sub('_', str(sheet_name))
                     csv_path = filepath.parent / f"{filepath.stem}_{safe_sheet}.csv"
-                    sheet_df.to_csv(csv_path, index=False, encoding="utf-8")
+                    write_csv(sheet_df, csv_path)
                     converted_files.append(str(csv_path))
                 result["converted"] = converted_files
             
@@ -246,24 +428,22 @@ def convert_file(filepath: Path, remove_original: bool = False) -> dict:
             # Fallback: extract text from HTML to .txt
             try:
                 # Try to detect encoding (common Chinese encodings)
+                raw = filepath.read_bytes()
                 html_content = None
                 for enc in ['utf-8', 'big5', 'gb2312', 'gbk']:
                     try:
-                        with open(filepath, "r", encoding=enc) as fh:
-                            html_content = fh.read()
-                            break
+                        html_content = raw.decode(enc)
+                        break
                     except (UnicodeDecodeError, LookupError):
                         continue
                 
                 if html_content is None:
-                    with open(filepath, "r", encoding="utf-8", errors="ignore") as fh:
-                        html_content = fh.read()
+                    html_content = raw.decode("utf-8", errors="ignore")
                 
                 soup = BeautifulSoup(html_content, "html.parser")
                 text = soup.get_text("\n", strip=True)
                 txt_path = filepath.with_suffix(".txt")
-                with open(txt_path, "w", encoding="utf-8") as out:
-                    out.write(text)
+                txt_path.write_text(text, encoding="utf-8")
                 result["converted"] = str(txt_path)
                 result["ok"] = True
                 result["action"] = "converted"
@@ -360,8 +540,7 @@ def convert_file(filepath: Path, remove_original: bool = False) -> dict:
                     doc = Document(str(filepath))
                     lines = [p.text for p in doc.paragraphs]
                     txt_path = filepath.with_suffix(".txt")
-                    with open(txt_path, "w", encoding="utf-8") as out:
-                        out.write("\n".join(lines))
+                    txt_path.write_text("\n".join(lines), encoding="utf-8")
                     result["converted"] = str(txt_path)
                     result["ok"] = True
                     result["action"] = "converted"
@@ -384,6 +563,21 @@ def convert_file(filepath: Path, remove_original: bool = False) -> dict:
     return result
 
 
+def sniff_encoding(resp: requests.Response, default: str = "big5") -> str:
+    """
+    Pick the page encoding from the Content-Type charset, else a <meta>
+    charset in the first 2 KB, else default (the site serves Big5). This
+    replaces resp.apparent_encoding, which runs chardet over the whole body.
+    """
+    m = _CHARSET_RE.search(resp.headers.get("content-type", ""))
+    if m:
+        return m.group(1).lower()
+    m = _META_CHARSET_RE.search(resp.content[:2048])
+    if m:
+        return m.group(1).decode("ascii").lower()
+    return default
+
+
 def build_url_template(url: str) -> str:
     """Return a template where {n} will be substituted.
 
@@ -393,7 +587,7 @@ def build_url_template(url: str) -> str:
     if "{n}" in url:
         return url
     # attempt to find a number before .asp or end
-    m = re.search(r"(.*?)(\d+)(\.asp.*|$)", url)
+    m = _URL_N_RE.search(url)
     if m:
         prefix, num, suffix = m.group(1), m.group(2), m.group(3)
         return f"{prefix}{{n}}{suffix}"
@@ -417,11 +611,12 @@ def main(argv=None):
     parser.add_argument("--remove-originals", action="store_true", help="Remove original files after conversion (only with --convert)")
     parser.add_argument("--quiet", action="store_true", help="Quiet mode")
     parser.add_argument("--no-metadata", action="store_true", help="Do not write metadata.json or summary.json files")
+    parser.add_argument("--jobs", type=int, required=False, help="Number of concurrent downloads", default=8)
     args = parser.parse_args(argv)
 
     logging.basicConfig(level=logging.INFO if not args.quiet else logging.WARNING, format="%(levelname)s: %(message)s")
 
-    allowed = [e.strip().lower() for e in args.extensions.split(",") if e.strip()]
+    allowed = tuple("." + e.strip().lower().lstrip(".") for e in args.extensions.split(",") if e.strip())
 
     base_dir = Path(__file__).resolve().parent
     out_dir = base_dir / args.outdir
@@ -429,8 +624,23 @@ def main(argv=None):
 
     session = requests.Session()
     session.headers.update({"User-Agent": "ncu-campus-qa-bot/1.0"})
+    # certificates come from one shared SSLContext, loaded once per run
+    verify = not args.insecure
+    if args.insecure:
+        ssl_context = None
+    else:
+        ssl_context = ssl.create_default_context(cafile=certifi.where() if certifi is not None else None)
+    # one keep-alive pool for every page and file on the host, so TCP/TLS
+    # handshakes are paid once per connection rather than once per request
+    retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                    allowed_methods={"GET", "HEAD"}, respect_retry_after_header=True)
+    # at least one pooled connection per download thread, so workers never
+    # open (and then discard) connections beyond the pool
+    adapter = SSLContextAdapter(ssl_context=ssl_context, pool_connections=8, pool_maxsize=max(64, args.jobs),
+                                max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
 
-    verify = False if args.insecure else (certifi.where() if certifi is not None else True)
     if args.insecure:
         try:
             import urllib3
@@ -441,75 +651,93 @@ def main(argv=None):
     template = build_url_template(args.url)
     logging.info("Using URL template: %s", template)
 
-    all_results = []
-    for n in range(args.start, args.end + 1):
+    pool = None
+    if args.convert:
+        pool_kwargs = {"max_tasks_per_child": 8} if sys.version_info >= (3, 11) else {}
+        pool = ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, 4), **pool_kwargs)
+
+    # Each page number is an independent pipeline (own page, own folder), so
+    # they run side by side; downloads still go through each page's own pool
+    def process_n(n: int) -> dict:
         page_url = template.format(n=n)
         logging.info("Fetching page %s", page_url)
         try:
             r = session.get(page_url, timeout=20, verify=verify)
             r.raise_for_status()
             # Try to decode with proper encoding (site uses Big5)
-            r.encoding = r.apparent_encoding or 'big5'
+            r.encoding = sniff_encoding(r)
         except requests.RequestException as e:
             logging.error("Failed to fetch %s: %s", page_url, e)
-            all_results.append({"n": n, "source_page": page_url, "results": [], "error": str(e)})
-            continue
+            return {"n": n, "source_page": page_url, "results": [], "error": str(e)}
 
-        # Check for iframe - if present, fetch iframe content instead
-        iframe_src = extract_iframe_src(r.text, page_url)
+        # Check for iframe - if present, fetch iframe content instead; the
+        # same pass has already collected the page's own links
+        iframe_src, to_download = parse_page(r.content, r.encoding, page_url, allowed)
         if iframe_src:
             logging.info("Found iframe, fetching content from %s", iframe_src)
             try:
                 r_iframe = session.get(iframe_src, timeout=20, verify=verify)
                 r_iframe.raise_for_status()
-                r_iframe.encoding = r_iframe.apparent_encoding or 'big5'
-                links = extract_links(r_iframe.text, iframe_src)
+                r_iframe.encoding = sniff_encoding(r_iframe)
+                _, to_download = parse_page(r_iframe.content, r_iframe.encoding, iframe_src, allowed)
             except requests.RequestException as e:
                 logging.error("Failed to fetch iframe %s: %s", iframe_src, e)
-                all_results.append({"n": n, "source_page": page_url, "iframe": iframe_src, "results": [], "error": str(e)})
-                continue
-        else:
-            links = extract_links(r.text, page_url)
-
-        # filter
-        to_download = []
-        seen = set()
-        for link in links:
-            if link in seen:
-                continue
-            seen.add(link)
-            if has_allowed_ext(link, allowed):
-                to_download.append(link)
+                return {"n": n, "source_page": page_url, "iframe": iframe_src, "results": [], "error": str(e)}
 
         logging.info("Page %s: found %d candidate files", n, len(to_download))
 
         n_out = out_dir / str(n)
         n_out.mkdir(parents=True, exist_ok=True)
 
-        results = []
-        for url in to_download:
+        cache_index = load_cache_index(n_out)
+
+        def fetch(item):
+            url, filename_hint = item
             logging.info("[%s] Downloading %s", n, url)
-            rec = download_file(session, url, n_out, verify=verify)
-            results.append(rec)
+            rec = download_file(session, url, n_out, filename_hint=filename_hint, verify=verify,
+                                cached=cache_index.get(url))
+            # Hand the file to the conversion pool as soon as it is on disk, so
+            # CPU-bound conversions overlap the downloads still in flight
+            future = None
+            if pool is not None and rec.get("ok") and rec.get("filename"):
+                filepath = Path(rec["filename"])
+                if filepath.exists():
+                    ext = filepath.suffix.lower()
+                    if ext in RAG_FRIENDLY_EXTS:
+                        # Skip already friendly formats entirely
+                        rec["conversion"] = {"original": str(filepath), "converted": None, "ok": True, "reason": "already RAG-friendly format", "action": "skipped"}
+                    else:
+                        logging.info("[%s] Converting %s", n, filepath.name)
+                        future = pool.submit(convert_file, filepath, args.remove_originals)
+            return rec, future
+
+        # map keeps results in link order
+        with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+            fetched = list(executor.map(fetch, to_download))
+        results = [rec for rec, _ in fetched]
+
+        # remember validators so the next run can send conditional requests
+        for rec in results:
+            if rec.get("ok") and (rec.get("etag") or rec.get("last_modified")):
+                cache_index[rec["url"]] = {"filename": rec["filename"], "etag": rec["etag"],
+                                           "last_modified": rec["last_modified"]}
+        save_cache_index(n_out, cache_index)
+        unchanged = sum(1 for r in results if r.get("reason") in ("not_modified", "already_downloaded"))
+        if unchanged:
+            logging.info("Page %s: %d files unchanged since the last run", n, unchanged)
         
-        # Convert files if requested
+        # Collect the conversions started during the downloads
         if args.convert:
-            logging.info("Page %s: converting files to RAG-friendly formats", n)
             conversion_results = []
-            for rec in results:
-                if rec.get("ok") and rec.get("filename"):
-                    filepath = Path(rec["filename"])
-                    if filepath.exists():
-                        ext = filepath.suffix.lower()
-                        if ext in RAG_FRIENDLY_EXTS:
-                            # Skip already friendly formats entirely
-                            rec["conversion"] = {"original": str(filepath), "converted": None, "ok": True, "reason": "already RAG-friendly format", "action": "skipped"}
-                            continue
-
-                        logging.info("[%s] Converting %s", n, filepath.name)
-                        conv_rec = convert_file(filepath, remove_original=args.remove_originals)
-                        conversion_results.append(conv_rec)
-                        rec["conversion"] = conv_rec
+            for rec, future in fetched:
+                if future is not None:
+                    try:
+                        rec["conversion"] = future.result()
+                    except Exception as e:
+                        # e.g. BrokenProcessPool when a worker dies: record it instead of losing the page
+                        rec["conversion"] = {"original": rec["filename"], "converted": None, "ok": False,
+                                             "reason": str(e), "action": "failed"}
+                    conversion_results.append(rec["conversion"])
 
             conv_converted = sum(1 for c in conversion_results if c.get("action") == "converted")
             conv_failed = sum(1 for c in conversion_results if c.get("action") == "failed")
@@ -519,17 +747,22 @@ def main(argv=None):
         ok_count = sum(1 for r in results if r.get("ok"))
         if not args.no_metadata:
             meta_file = n_out / "metadata.json"
-            with open(meta_file, "w", encoding="utf-8") as fh:
-                json.dump({"source_page": page_url, "fetched_at": int(time.time()), "results": results}, fh, ensure_ascii=False, indent=2)
+            meta_file.write_bytes(dump_json({"source_page": page_url, "fetched_at": int(time.time()), "results": results}))
             logging.info("Page %s completed: %d succeeded, %d failed. Metadata: %s", n, ok_count, len(results) - ok_count, meta_file)
         else:
             logging.info("Page %s completed: %d succeeded, %d failed.", n, ok_count, len(results) - ok_count)
-        all_results.append({"n": n, "source_page": page_url, "results": results})
+        return {"n": n, "source_page": page_url, "results": results}
+
+    numbers = list(range(args.start, args.end + 1))
+    with ThreadPoolExecutor(max_workers=max(1, min(8, len(numbers)))) as executor:
+        all_results = list(executor.map(process_n, numbers))
+
+    if pool is not None:
+        pool.shutdown()
 
     if not args.no_metadata:
         summary_file = out_dir / "summary.json"
-        with open(summary_file, "w", encoding="utf-8") as fh:
-            json.dump({"start": args.start, "end": args.end, "fetched_at": int(time.time()), "data": all_results}, fh, ensure_ascii=False, indent=2)
+        summary_file.write_bytes(dump_json({"start": args.start, "end": args.end, "fetched_at": int(time.time()), "data": all_results}))
         logging.info("All done. Summary: %s", summary_file)
     else:
         logging.info("All done.")
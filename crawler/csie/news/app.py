@@ -5,7 +5,7 @@ crawl_announcements.py
 Crawl announcement pages for multiple categories and extract to CSV.
 
 Usage:
-    python app.py [--max-pages N] [--output announcements.csv] [category1 category2 ...]
+    python app.py [--max-pages N] [--output announcements.csv] [--workers N] [category1 category2 ...]
 
 If no categories are provided the script will crawl all predefined categories.
 
@@ -20,7 +20,66 @@ import argparse
 import time
 import re
 import csv
-from typing import List, Tuple
+import hashlib
+import itertools
+import json
+import queue
+import sqlite3
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import quote_plus, urljoin
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+except ImportError:
+    requests = None
+
+try:
+    from bs4 import BeautifulSoup, SoupStrainer
+    import soupsieve  # installed with bs4; compiles the detail-page selectors once
+except ImportError:
+    BeautifulSoup = SoupStrainer = soupsieve = None
+
+# Prefer the C-based lxml parser when it is installed
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# List pages are only read for their links: build the soup from <a href>
+# subtrees alone and skip materializing the rest of the document
+_ANCHOR_STRAINER = SoupStrainer("a", href=True) if SoupStrainer is not None else None
+
+# Detail-page selectors, compiled once instead of on every select_one call.
+# Content containers stay separate, tried in priority order: a grouped
+# selector would return whichever matches first in the document, and the
+# outer .card comes before the .card-markdown it wraps.
+if soupsieve is not None:
+    _TITLE_SEL = soupsieve.compile(".card.card-large h3")
+    _DATE_SEL = soupsieve.compile(".item-time, time, .date, .post-date")
+    _CONTENT_SELS = [soupsieve.compile(sel) for sel in (".card-markdown", ".markdown", ".content", "article", ".card")]
+    _CHROME_SEL = soupsieve.compile("nav, header, footer, .navbar, .banner")
+
+# Regex fallbacks used when bs4 is not installed. They run on the raw page
+# bytes (the site is UTF-8), so only the captured fields get decoded.
+_ANN_LIST_RE = re.compile(
+    rb'<a[^>]*class="link"[^>]*>.*?'
+    rb'<div class="item-title">([^<]+)</div>.*?'
+    rb'<div class="item-time">([^<]+)</div>.*?href="([^"]+)"',
+    re.DOTALL,
+)
+_NO_DATA_RE = re.compile("(查無資料|沒有資料|無資料)".encode("utf-8"))
+_ANN_HREF_RE = re.compile(rb"/announcement/|announcement")
+
+
+# detail pages seen by earlier runs, so re-runs only refetch what changed
+CACHE_FILENAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), "detail_cache.sqlite")
 
 
 DEFAULT_CATEGORIES = [
@@ -34,134 +93,178 @@ DEFAULT_CATEGORIES = [
 ]
 
 
-def fetch(url: str, timeout: int = 15, headers=None):
-    headers = headers or {"User-Agent": "Mozilla/5.0 (compatible; csie-crawler/1.0)"}
-    try:
-        import requests
-    except Exception:
-        requests = None
+def make_session(pool_size: int = 8):
+    """
+    Build the one requests.Session shared by every fetch of a crawl, so all
+    requests to the site reuse its kept-alive connections instead of paying
+    a TCP + TLS handshake each. Returns None when requests is not installed.
+    """
+    if requests is None:
+        return None
+
+    session = requests.Session()
+    retry = Retry(total=2, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+    # one pooled connection per worker thread
+    adapter = HTTPAdapter(max_retries=retry, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class FetchResult(NamedTuple):
+    status: Optional[int]
+    content: Optional[bytes]
+    url: str
+    elapsed: float
+    headers: dict
+
+
+def fetch(session, url: str, timeout: int = 15, headers=None, extra_headers=None) -> FetchResult:
+    """
+    Fetch url and return (status, content, final_url, elapsed, headers), where
+    elapsed is the wall time spent on it in seconds (retries included) and
+    status and content are None when every attempt failed. extra_headers are
+    sent on top of the default ones (e.g. conditional-request validators).
+    """
+    headers = dict(headers or {"User-Agent": "Mozilla/5.0 (compatible; csie-crawler/1.0)"})
+    if extra_headers:
+        headers.update(extra_headers)
+    t0 = time.monotonic()
 
     # Try with requests first (with a few retries)
-    if requests:
-        session = None
-        try:
-            session = requests.Session()
-            # Best-effort attach retry adapter if available
-            try:
-                from urllib3.util.retry import Retry  # type: ignore
-                from requests.adapters import HTTPAdapter  # type: ignore
-
-                retry = Retry(total=2, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
-                adapter = HTTPAdapter(max_retries=retry)
-                session.mount("http://", adapter)
-                session.mount("https://", adapter)
-            except Exception:
-                pass
-
-            last_exc = None
-            for attempt in range(3):
-                try:
-                    r = session.get(url, headers=headers, timeout=timeout)
-                    return r.status_code, r.content, getattr(r, "url", url)
-                except Exception as e:
-                    last_exc = e
-                    print(f"requests attempt {attempt+1}/3 failed for {url}: {e}")
-                    time.sleep(min(1.5, 0.3 * (2 ** attempt)))
-            print(f"requests failed for {url}: {last_exc}; falling back to urllib")
-        except Exception as e:
-            print(f"requests error for {url}: {e}; falling back to urllib")
-        finally:
+    if session is not None:
+        last_exc = None
+        for attempt in range(3):
             try:
-                if session:
-                    session.close()
-            except Exception:
-                pass
+                r = session.get(url, headers=headers, timeout=timeout)
+                return FetchResult(r.status_code, r.content, getattr(r, "url", url), time.monotonic() - t0, r.headers)
+            except Exception as e:
+                last_exc = e
+                print(f"requests attempt {attempt+1}/3 failed for {url}: {e}")
+                time.sleep(min(1.5, 0.3 * (2 ** attempt)))
+        print(f"requests failed for {url}: {last_exc}; falling back to urllib")
 
     # Fallback to urllib
     try:
-        import urllib.request
         req = urllib.request.Request(url, headers=headers)
         with urllib.request.urlopen(req, timeout=timeout) as resp:
             content = resp.read()
-            return resp.getcode(), content, getattr(resp, "geturl", lambda: url)()
+            return FetchResult(resp.getcode(), content, getattr(resp, "geturl", lambda: url)(), time.monotonic() - t0,
+                               resp.headers)
+    except urllib.error.HTTPError as e:
+        # urllib raises on 304 and 4xx/5xx; report the status like requests does
+        return FetchResult(e.code, b"", url, time.monotonic() - t0, e.headers)
     except Exception as e:
         print(f"urllib error for {url}: {e}")
-        return None, None, url
+        return FetchResult(None, None, url, time.monotonic() - t0, {})
 
 
-def parse_announcements_from_html(html: bytes, category: str) -> List[Tuple[str, str, str, str]]:
+class DetailCache:
     """
-    Parse HTML content and extract announcements.
-    Returns a list of (category, title, date, url) tuples.
+    Detail pages fetched by earlier runs, kept in SQLite: per URL, the
+    ETag/Last-Modified the server sent, a hash of the body and the parsed
+    (detail_title, detail_date, detail_text). A re-run sends conditional
+    requests and reuses the parsed fields for pages that did not change.
+    Shared by the detail worker threads.
     """
-    text = html.decode("utf-8", errors="ignore")
 
+    # rows written before each commit, so an interrupted run keeps most of its work
+    COMMIT_EVERY = 50
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._uncommitted = 0
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS details "
+                "(url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body_hash TEXT, row TEXT)"
+            )
+
+    def get(self, url: str) -> Optional[dict]:
+        with self._lock:
+            found = self._conn.execute(
+                "SELECT etag, last_modified, body_hash, row FROM details WHERE url = ?", (url,)
+            ).fetchone()
+        if found is None:
+            return None
+        etag, last_modified, body_hash, row = found
+        return {"etag": etag, "last_modified": last_modified, "body_hash": body_hash, "row": tuple(json.loads(row))}
+
+    def put(self, url: str, etag: Optional[str], last_modified: Optional[str], body_hash: str, row: Tuple[str, str, str]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO details (url, etag, last_modified, body_hash, row) VALUES (?, ?, ?, ?, ?)",
+                (url, etag, last_modified, body_hash, json.dumps(list(row), ensure_ascii=False)),
+            )
+            self._uncommitted += 1
+            if self._uncommitted >= self.COMMIT_EVERY:
+                self._conn.commit()
+                self._uncommitted = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+
+def parse_page(html: bytes, category: str) -> Tuple[bool, List[Tuple[str, str, str, str]]]:
+    """
+    Parse a list page once and return (has_announcements, announcements),
+    where announcements is a list of (category, title, date, url) tuples and
+    has_announcements tells whether the page links to any announcement at all.
+    """
     # Try BeautifulSoup for accurate parsing
-    try:
-        from bs4 import BeautifulSoup
-        from urllib.parse import urljoin
-
-        soup = BeautifulSoup(text, "html.parser")
-        links = soup.find_all("a", class_="link", href=True)
-        results = []
-        for link in links:
-            title_div = link.find("div", class_="item-title")
-            time_div = link.find("div", class_="item-time")
-            if title_div and time_div:
-                title = title_div.get_text(strip=True)
-                date = time_div.get_text(strip=True)
-                href = link.get("href", "")
-                url = urljoin("https://www.csie.ncu.edu.tw/", href)
-                results.append((category, title, date, url))
-        return results
-    except Exception:
-        # Fallback: regex-based extraction
-        results = []
-        import re
-        from urllib.parse import urljoin
-        pattern = re.compile(
-            r'<a[^>]*class="link"[^>]*>.*?'
-            r'<div class="item-title">([^<]+)</div>.*?'
-            r'<div class="item-time">([^<]+)</div>.*?href="([^"]+)"',
-            re.DOTALL,
-        )
-        for match in pattern.finditer(text):
-            title = match.group(1).strip()
-            date = match.group(2).strip()
-            href = match.group(3).strip()
-            url = urljoin("https://www.csie.ncu.edu.tw/", href)
-            results.append((category, title, date, url))
-        return results
-
-
-def page_has_announcements(html: bytes) -> bool:
-    text = html.decode("utf-8", errors="ignore")
-
-    # Try BeautifulSoup if available for more accurate detection
-    try:
-        from bs4 import BeautifulSoup
-
-        soup = BeautifulSoup(text, "html.parser")
-        # Look for <a> links that likely point to announcement details
-        anchors = soup.find_all("a", href=True)
-        count = 0
-        for a in anchors:
-            href = a["href"]
-            if "/announcement/" in href or "announcement" in href:
-                count += 1
-        return count > 0
-    except Exception:
-        # Fallback heuristics: look for typical keywords or announcement links
-        if re.search(r"(查無資料|沒有資料|無資料)", text):
-            return False
-        # Count occurrences of 'announcement' paths or common link patterns
-        return bool(re.search(r"/announcement/|announcement", text))
-
-
-def write_details_csv(details: List[Tuple[str, str, str, str, str, str, str]], output_path: str):
+    if BeautifulSoup is not None:
+        try:
+            # hand the parser the bytes: it decodes them itself, honouring <meta charset>
+            soup = BeautifulSoup(html, HTML_PARSER, parse_only=_ANCHOR_STRAINER)
+            # Look for <a> links that likely point to announcement details
+            anchors = soup.find_all("a")
+            has = any("announcement" in a.get("href", "") for a in anchors)
+            links = [a for a in anchors if "link" in a.get("class", ())]
+            results = []
+            for link in links:
+                # one walk of the anchor's subtree picks up both fields
+                title_div = time_div = None
+                for div in link.find_all("div", class_=["item-title", "item-time"]):
+                    classes = div.get("class", ())
+                    if title_div is None and "item-title" in classes:
+                        title_div = div
+                    elif time_div is None and "item-time" in classes:
+                        time_div = div
+                if title_div and time_div:
+                    title = title_div.get_text(strip=True)
+                    date = time_div.get_text(strip=True)
+                    href = link.get("href", "")
+                    url = urljoin("https://www.csie.ncu.edu.tw/", href)
+                    results.append((category, title, date, url))
+            return has, results
+        except Exception:
+            pass  # unparseable page: use the regex heuristics below
+
+    # Fallback: regex-based extraction
+    results = []
+    for match in _ANN_LIST_RE.finditer(html):
+        title = match.group(1).decode("utf-8", errors="ignore").strip()
+        date = match.group(2).decode("utf-8", errors="ignore").strip()
+        href = match.group(3).decode("utf-8", errors="ignore").strip()
+        url = urljoin("https://www.csie.ncu.edu.tw/", href)
+        results.append((category, title, date, url))
+    # Fallback heuristics: look for typical keywords or announcement links
+    has = not _NO_DATA_RE.search(html) and bool(_ANN_HREF_RE.search(html))
+    return has, results
+
+
+def write_details_csv(details: Iterable[Tuple[str, str, str, str, str, str, str]], output_path: str,
+                      flush_every: int = 50) -> int:
     """
     Write detail announcements to CSV with columns:
     category, list_title, list_date, url, detail_title, detail_date, detail_text
+
+    Rows are written as details yields them and flushed every flush_every
+    rows, so an interrupted crawl keeps what it has fetched. Returns the
+    row count.
     """
     def _san(s: str) -> str:
         if s is None:
@@ -173,13 +276,18 @@ def write_details_csv(details: List[Tuple[str, str, str, str, str, str, str]], o
         s = s.replace("\t", "\\t").replace("\n", "\\n")
         return s
     try:
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        count = 0
         with open(output_path, "w", newline="", encoding="utf-8") as csvfile:
             writer = csv.writer(csvfile)
             writer.writerow(["category", "list_title", "list_date", "url", "detail_title", "detail_date", "detail_text"])
             for row in details:
                 writer.writerow([_san(col) for col in row])
-        print(f"Wrote {len(details)} detail records to {output_path}")
+                count += 1
+                if count % flush_every == 0:
+                    csvfile.flush()
+        print(f"Wrote {count} detail records to {output_path}")
+        return count
     except Exception as e:
         print(f"Error writing details CSV: {e}")
         raise
@@ -190,40 +298,33 @@ def parse_detail_html(html: bytes) -> Tuple[str, str, str]:
     Parse a detail page and return (detail_title, detail_date, detail_text).
     Best-effort heuristics using BeautifulSoup; falls back to plain text.
     """
-    text = html.decode("utf-8", errors="ignore")
-    try:
-        from bs4 import BeautifulSoup
-
-        soup = BeautifulSoup(text, "html.parser")
-        # Title: try h3 inside content cards, else first h1/h2/h3
-        title_node = soup.select_one(".card.card-large h3") or soup.find(["h1", "h2", "h3"]) or soup.title
-        title = title_node.get_text(strip=True) if title_node else ""
-
-        # Date: often near item-time; try common selectors
-        date_node = soup.select_one(".item-time, time, .date, .post-date")
-        date_text = date_node.get_text(strip=True) if date_node else ""
-
-        # Content: try common containers
-        content_node = (
-            soup.select_one(".card-markdown") or
-            soup.select_one(".markdown") or
-            soup.select_one(".content") or
-            soup.select_one("article") or
-            soup.select_one(".card")
-        )
-        if content_node:
-            # Remove navs/headers/footers
-            for sel in ["nav", "header", "footer", ".navbar", ".banner"]:
-                for n in content_node.select(sel):
+    if BeautifulSoup is not None:
+        try:
+            soup = BeautifulSoup(html, HTML_PARSER)
+            # Title: try h3 inside content cards, else first h1/h2/h3
+            title_node = _TITLE_SEL.select_one(soup) or soup.find(["h1", "h2", "h3"]) or soup.title
+            title = title_node.get_text(strip=True) if title_node else ""
+
+            # Date: often near item-time; try common selectors
+            date_node = _DATE_SEL.select_one(soup)
+            date_text = date_node.get_text(strip=True) if date_node else ""
+
+            # Content: try common containers
+            content_node = next((node for node in (sel.select_one(soup) for sel in _CONTENT_SELS) if node), None)
+            if content_node:
+                # Remove navs/headers/footers, all in one pass over the subtree
+                for n in _CHROME_SEL.select(content_node):
                     n.extract()
-            detail_text = content_node.get_text("\n", strip=True)
-        else:
-            detail_text = soup.get_text("\n", strip=True)
+                detail_text = content_node.get_text("\n", strip=True)
+            else:
+                detail_text = soup.get_text("\n", strip=True)
 
-        return title, date_text, detail_text
-    except Exception:
-        # Fallback: crude extraction
-        return "", "", text
+            return title, date_text, detail_text
+        except Exception:
+            pass  # unparseable page: return its raw text below
+
+    # Fallback: crude extraction
+    return "", "", html.decode("utf-8", errors="ignore")
 
 
 def crawl(
@@ -231,85 +332,147 @@ def crawl(
     max_pages: int = 200,
     output_csv: str = "announcements.csv",
     delay: float = 0.5,
+    workers: int = 8,
+    batch_size: int = 32,
+    cache_path: Optional[str] = CACHE_FILENAME,
 ):
-    base = "https://www.csie.ncu.edu.tw/announcement/page/{page}/category/{category}"
-    all_announcements: List[Tuple[str, str, str, str]] = []  # (cat, title, date, url)
-    
-    for cat in categories:
-        cat_enc = cat
-        try:
-            from urllib.parse import quote_plus
-            cat_enc = quote_plus(cat)
-        except Exception:
-            pass
-
-        print(f"Crawling category: {cat}")
-
-        page = 1
-        consecutive_failures = 0
-        while page <= max_pages:
-            url = base.format(page=page, category=cat_enc)
-            print(f"  fetching page {page}: {url}")
-            status, content, final_url = fetch(url)
-            if status is None:
-                print("   failed to fetch (network error), stopping this category")
-                break
-            if status >= 400:
-                print(f"   HTTP {status} — stopping at page {page}")
-                break
-
-            # If returned content is very small, treat as end
-            if not content or len(content) < 500:
-                consecutive_failures += 1
-                print(f"   small page ({len(content) if content else 0} bytes).")
-                if consecutive_failures >= 2:
-                    print("   likely end of pages — stopping")
-                    break
+    url_prefix = "https://www.csie.ncu.edu.tw/announcement/page/"
+    session = make_session(pool_size=max(1, workers))
+    cache = DetailCache(cache_path) if cache_path else None
+
+    # close in finally, so an exception or Ctrl-C still commits the cached details
+    try:
+        # List pages are walked by a producer thread that queues each new detail
+        # URL as soon as its page is parsed, so detail fetching starts while the
+        # listing is still being crawled; the bounded queue keeps the producer
+        # from running far ahead of the detail workers.
+        listings: "queue.Queue" = queue.Queue(maxsize=256)
+        done = object()
+        listed = [0]
+
+        def produce():
+            seen = set()
+            try:
+                for cat in categories:
+                    # only the page number changes inside the loop
+                    url_suffix = f"/category/{quote_plus(cat)}"
+
+                    print(f"Crawling category: {cat}")
+
+                    page = 1
+                    consecutive_failures = 0
+                    while page <= max_pages:
+                        url = f"{url_prefix}{page}{url_suffix}"
+                        print(f"  fetching page {page}: {url}")
+                        status, content, final_url, elapsed, _ = fetch(session, url)
+                        if status is None:
+                            print("   failed to fetch (network error), stopping this category")
+                            break
+                        if status >= 400:
+                            print(f"   HTTP {status} — stopping at page {page}")
+                            break
+
+                        # If returned content is very small, treat as end
+                        if not content or len(content) < 500:
+                            consecutive_failures += 1
+                            print(f"   small page ({len(content) if content else 0} bytes).")
+                            if consecutive_failures >= 2:
+                                print("   likely end of pages — stopping")
+                                break
+                        else:
+                            consecutive_failures = 0
+
+                        # A page with no "announcement" anywhere in its bytes cannot link
+                        # to one, so the end of the listing is found without a parse
+                        if page > 1 and (not content or b"announcement" not in content):
+                            print("   no announcement links found — reached the end")
+                            break
+
+                        # Parse announcements from this page; the same pass tells
+                        # whether the page still links to any announcement
+                        has, ann_on_page = parse_page(content or b"", cat)
+                        if not has and page > 1:
+                            print("   no announcement links found — reached the end")
+                            break
+
+                        print(f"   extracted {len(ann_on_page)} announcements from page {page}")
+                        for _, ltitle, ldate, url in ann_on_page:
+                            listed[0] += 1
+                            # one job per detail URL, from the first listing that mentions it
+                            if url not in seen:
+                                seen.add(url)
+                                listings.put((url, (cat, ltitle, ldate)))
+
+                        page += 1
+                        # a slow response already spaced the requests out; only wait
+                        # for whatever is left of the delay
+                        time.sleep(max(0.0, delay - elapsed))
+            finally:
+                listings.put(done)
+
+        producer = threading.Thread(target=produce, name="list-pages", daemon=True)
+        producer.start()
+
+        def fetch_detail(job: Tuple[int, Tuple[str, Tuple[str, str, str]]]) -> Tuple[str, str, str, str, str, str, str]:
+            idx, (url, (cat, ltitle, ldate)) = job
+            print(f"  fetching detail {idx}: {url}")
+            cached = cache.get(url) if cache is not None else None
+            validators = {}
+            if cached and cached["etag"]:
+                validators["If-None-Match"] = cached["etag"]
+            if cached and cached["last_modified"]:
+                validators["If-Modified-Since"] = cached["last_modified"]
+            status, html, _, elapsed, resp_headers = fetch(session, url, extra_headers=validators)
+            # each worker keeps its own pause, so the site sees at most
+            # `workers` requests per delay window; time spent waiting on the
+            # response counts towards it
+            if status == 304 and cached:
+                time.sleep(max(0.0, delay - elapsed))
+                return (cat, ltitle, ldate, url) + cached["row"]
+            if not html:
+                print("    failed to fetch detail")
+                # Still add row with empty detail fields
+                return (cat, ltitle, ldate, url, "", "", "")
+            # servers without validators still resend identical pages: skip the parse
+            body_hash = hashlib.sha1(html).hexdigest()
+            if cached and cached["body_hash"] == body_hash:
+                detail = cached["row"]
             else:
-                consecutive_failures = 0
-
-            has = page_has_announcements(content)
-            if not has and page > 1:
-                print("   no announcement links found — reached the end")
-                break
-
-            # Parse announcements from this page
-            ann_on_page = parse_announcements_from_html(content, cat)
-            all_announcements.extend(ann_on_page)
-            print(f"   extracted {len(ann_on_page)} announcements from page {page}")
-
-            page += 1
-            time.sleep(delay)
-
-    if not all_announcements:
-        print("\nNo announcements found.")
-        return 0
-
-    # Fetch detail pages for ALL announcements
-    print(f"\nFetching details for {len(all_announcements)} announcements...")
-    detail_rows: List[Tuple[str, str, str, str, str, str, str]] = []
-    seen_urls = set()
-    
-    for idx, (cat, ltitle, ldate, url) in enumerate(all_announcements, start=1):
-        if url in seen_urls:
-            continue
-        seen_urls.add(url)
-        
-        print(f"  fetching detail {idx}/{len(all_announcements)}: {url}")
-        status, html, _ = fetch(url)
-        if not html:
-            print("    failed to fetch detail")
-            # Still add row with empty detail fields
-            detail_rows.append((cat, ltitle, ldate, url, "", "", ""))
-            continue
-        dtitle, ddate, dtext = parse_detail_html(html)
-        detail_rows.append((cat, ltitle, ldate, url, dtitle, ddate, dtext))
-        time.sleep(delay)
-
-    if detail_rows:
-        write_details_csv(detail_rows, output_csv)
-
-    return len(detail_rows)
+                detail = parse_detail_html(html)
+            if cache is not None and status == 200:
+                cache.put(url, resp_headers.get("ETag"), resp_headers.get("Last-Modified"), body_hash, detail)
+            time.sleep(max(0.0, delay - elapsed))
+            return (cat, ltitle, ldate, url) + tuple(detail)
+
+        jobs = enumerate(iter(listings.get, done), start=1)
+        first = next(jobs, None)
+        if first is None:
+            print("\nNo announcements found.")
+            return 0
+        print("\nFetching details as announcements are listed...")
+        batch_size = max(1, batch_size)
+
+        def detail_rows(executor):
+            # detail pages are independent, so a batch of them is fetched at
+            # once; only one batch is in flight, and map keeps list order
+            pending = itertools.chain([first], jobs)
+            while True:
+                batch = list(itertools.islice(pending, batch_size))
+                if not batch:
+                    return
+                yield from executor.map(fetch_detail, batch)
+
+        # each batch reaches the CSV (and the disk) before the next one starts
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            count = write_details_csv(detail_rows(executor), output_csv, flush_every=batch_size)
+        producer.join()
+        print(f"{listed[0] - count} duplicate listings skipped")
+        return count
+    finally:
+        if session is not None:
+            session.close()
+        if cache is not None:
+            cache.close()
 
 
 def parse_args(argv: List[str]) -> argparse.Namespace:
@@ -318,6 +481,9 @@ def parse_args(argv: List[str]) -> argparse.Namespace:
     p.add_argument("--max-pages", type=int, default=200, help="Maximum pages to try per category")
     p.add_argument("--output", default="docs/news.csv", help="Output CSV file path (default: announcements.csv)")
     p.add_argument("--delay", type=float, default=0.5, help="Delay between requests in seconds")
+    p.add_argument("--workers", type=int, default=8, help="Number of detail pages fetched concurrently")
+    p.add_argument("--batch-size", type=int, default=32, help="Detail pages fetched per batch before the CSV is flushed")
+    p.add_argument("--no-cache", action="store_true", help="Refetch and reparse every detail page, ignoring detail_cache.sqlite")
     return p.parse_args(argv[1:])
 
 
@@ -329,6 +495,9 @@ def main(argv: List[str]) -> int:
         max_pages=args.max_pages,
         output_csv=args.output,
         delay=args.delay,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        cache_path=None if args.no_cache else CACHE_FILENAME,
     )
     return 0 if count > 0 else 1
 
@@ -1,4 +1,3 @@
-import time
 import csv
 import os
 from selenium import webdriver
@@ -7,9 +6,19 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from selenium.common.exceptions import TimeoutException
 
+# 若有安裝 lxml (C 實作的解析器) 就優先使用，否則退回內建的 html.parser
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+# 只把 Q&A 容器建成樹，頁面其餘部分不會變成 Python 物件
+QA_STRAINER = SoupStrainer('div', class_='inside-content-wrap')
+
 # --- CSV 相關設定 ---
 CSV_FOLDER = 'docs'
 CSV_FILENAME = 'qa.csv'
@@ -111,14 +120,21 @@ try:
             EC.invisibility_of_element_located((By.CLASS_NAME, "loading-wrap"))
         )
         print(f"第 1 頁載入完畢！")
-        time.sleep(0.5) 
+        # 等內容真的出現在 DOM 中就開始解析，不再固定多等 0.5 秒；
+        # 若該頁本來就沒有項目，等待逾時後照常解析，由下方的判斷處理
+        try:
+            WebDriverWait(driver, 5).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, "div.inside-content-wrap div.second-title"))
+            )
+        except TimeoutException:
+            print(f"第 1 頁的內容在 5 秒內沒有出現。")
     
     except TimeoutException:
         print(f"等待第 1 頁載入超時。")
         raise 
 
     current_html = driver.page_source
-    current_soup = BeautifulSoup(current_html, 'html.parser')
+    current_soup = BeautifulSoup(current_html, HTML_PARSER, parse_only=QA_STRAINER)
     all_qa_data = parse_page_content(current_soup, page_num=1)
     
     if not all_qa_data:
@@ -143,7 +159,7 @@ if all_qa_data:
         os.makedirs(CSV_FOLDER, exist_ok=True)
 
         print(f"正在寫入檔案至: {CSV_FULL_PATH}")
-        with open(CSV_FULL_PATH, 'w', newline='', encoding='utf-8-sig') as file:
+        with open(CSV_FULL_PATH, 'w', newline='', encoding='utf-8-sig', buffering=1 << 20) as file:
             writer = csv.writer(file)
             writer.writerow(CSV_HEADER)
             writer.writerows(all_qa_data)
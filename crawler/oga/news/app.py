@@ -1,4 +1,3 @@
-import time
 import csv
 import os
 from selenium import webdriver
@@ -7,9 +6,19 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from selenium.common.exceptions import NoSuchElementException, TimeoutException
 
+# 若有安裝 lxml (C 實作的解析器) 就優先使用，否則退回內建的 html.parser
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+# 只把新聞列表容器建成樹，頁面其餘部分不會變成 Python 物件
+NEWS_STRAINER = SoupStrainer('tbody', class_='news-wrap-table')
+
 # --- CSV 相關設定 ---
 CSV_FOLDER = 'docs'
 CSV_FILENAME = 'news.csv'
@@ -20,8 +29,25 @@ CSV_HEADER = ['日期', '標題', '連結']
 BASE_URL = "https://www.oga.ncu.edu.tw"
 PAGE_URL = f"{BASE_URL}/news/5f57f0b6"
 
-# 總資料搜集器
-all_news_data = []
+# 每頁解析完就寫入 CSV (第一筆資料出現時才建立檔案)，不必把全部資料留在記憶體
+csv_file = None
+csv_writer = None
+total_rows = 0
+
+def write_rows(rows):
+    """把一頁的資料寫入 CSV；第一次呼叫時建立資料夾、開檔並寫入標題列。"""
+    global csv_file, csv_writer, total_rows
+    if csv_writer is None:
+        print(f"正在檢查/建立資料夾: {CSV_FOLDER}")
+        os.makedirs(CSV_FOLDER, exist_ok=True)
+        print(f"正在寫入檔案至: {CSV_FULL_PATH}")
+        # 1 MiB 緩衝區，讓多頁資料合併成少量的實際寫入
+        csv_file = open(CSV_FULL_PATH, 'w', newline='', encoding='utf-8-sig', buffering=1 << 20)
+        csv_writer = csv.writer(csv_file)
+        csv_writer.writerow(CSV_HEADER)
+    csv_writer.writerows(rows)
+    total_rows += len(rows)
+
 
 def parse_page_content(soup, page_num):
     """
@@ -94,21 +120,32 @@ try:
                 EC.invisibility_of_element_located((By.CLASS_NAME, "loading-wrap"))
             )
             print(f"第 {page_num} 頁載入完畢！")
-            time.sleep(0.5) 
+            # 等內容真的出現在 DOM 中就開始解析，不再固定多等 0.5 秒；
+            # 若該頁本來就沒有項目，等待逾時後照常解析，由下方的判斷處理
+            try:
+                WebDriverWait(driver, 5).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, "tbody.news-wrap-table a.news-table-list"))
+                )
+            except TimeoutException:
+                print(f"第 {page_num} 頁的內容在 5 秒內沒有出現。")
         
         except TimeoutException:
             print(f"等待第 {page_num} 頁載入超時。")
             break
 
         current_html = driver.page_source
-        current_soup = BeautifulSoup(current_html, 'html.parser')
+        current_soup = BeautifulSoup(current_html, HTML_PARSER, parse_only=NEWS_STRAINER)
         new_data = parse_page_content(current_soup, page_num)
         
         if not new_data:
             print(f"第 {page_num} 頁沒有解析到任何資料，停止爬取。")
             break
             
-        all_news_data.extend(new_data)
+        try:
+            write_rows(new_data)
+        except IOError as e:
+            print(f"寫入 CSV 檔案時發生錯誤: {e}")
+            break
 
         try:
             next_button = driver.find_element(By.CSS_SELECTOR, "button[aria-label='下一頁']")
@@ -120,8 +157,16 @@ try:
                 break 
             else:
                 print(f"\n--- 正在點擊「下一頁」，前往第 {page_num + 1} 頁... ---")
+                # 點擊前先記住目前第一筆項目，換頁後它會從 DOM 移除；
+                # 否則下一輪的等待會立刻看到舊頁面的項目，重複解析同一頁
+                old_rows = driver.find_elements(By.CSS_SELECTOR, "tbody.news-wrap-table a.news-table-list")
                 driver.execute_script("arguments[0].click();", next_button)
                 page_num += 1
+                if old_rows:
+                    try:
+                        WebDriverWait(driver, 10).until(EC.staleness_of(old_rows[0]))
+                    except TimeoutException:
+                        print(f"第 {page_num - 1} 頁的內容在 10 秒內沒有被替換。")
 
         except NoSuchElementException:
             print("\n--- 找不到「下一頁」按鈕，已是唯一頁面。爬取完畢。 ---")
@@ -136,23 +181,12 @@ finally:
         driver.quit()
         print("\n--- 瀏覽器已關閉 ---")
 
-# --- 寫入 CSV 檔案 ---
-if all_news_data:
-    print(f"\n--- 爬取完畢，共 {len(all_news_data)} 筆資料 ---")
-    
-    try:
-        print(f"正在檢查/建立資料夾: {CSV_FOLDER}")
-        os.makedirs(CSV_FOLDER, exist_ok=True)
-
-        print(f"正在寫入檔案至: {CSV_FULL_PATH}")
-        with open(CSV_FULL_PATH, 'w', newline='', encoding='utf-8-sig') as file:
-            writer = csv.writer(file)
-            writer.writerow(CSV_HEADER)
-            writer.writerows(all_news_data)
-            
-        print(f"成功將資料儲存至 {CSV_FULL_PATH}")
+# --- 關閉 CSV 檔案 ---
+if csv_file is not None:
+    csv_file.close()
 
-    except IOError as e:
-        print(f"寫入 CSV 檔案時發生錯誤: {e}")
+if total_rows:
+    print(f"\n--- 爬取完畢，共 {total_rows} 筆資料 ---")
+    print(f"成功將資料儲存至 {CSV_FULL_PATH}")
 else:
-    print("\n--- 沒有抓取到任何資料，不建立 CSV 檔案。 ---")
\ No newline at end of file
+    print("\n--- 沒有抓取到任何資料，不建立 CSV 檔案。 ---")
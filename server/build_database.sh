@@ -94,7 +94,7 @@ if [ -d "chroma_db" ]; then
         echo ""
         echo "Options:"
         echo "  1) Remove and rebuild (recommended)"
-        echo "  2) Keep and append (may cause duplicates)"
+        echo "  2) Keep and update (may cause duplicates if built by an older version)"
         echo "  3) Abort"
         echo ""
         read -p "Choose (1/2/3): " -n 1 -r
@@ -116,7 +116,7 @@ if [ -d "chroma_db" ]; then
             echo "✅ Old database removed"
             ;;
         2)
-            echo "⚠️  Keeping existing database (may cause duplicates)"
+            echo "⚠️  Keeping existing database (may cause duplicates if built by an older version)"
             ;;
         3)
             echo "Aborted."
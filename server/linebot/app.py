@@ -1,7 +1,12 @@
 from flask import Flask, request, abort
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
+import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from linebot.v3 import WebhookHandler
 from linebot.v3.messaging import (
     Configuration,
@@ -22,6 +27,8 @@ app = Flask(__name__)
 LINE_CHANNEL_ACCESS_TOKEN = os.getenv("LINE_CHANNEL_ACCESS_TOKEN")
 LINE_CHANNEL_SECRET = os.getenv("LINE_CHANNEL_SECRET")
 RAG_SERVER_URL = os.getenv("RAG_SERVER_URL", "http://127.0.0.1:8000/v1/chat/completions")
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "2048"))  # 快取的問題數
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "3600"))    # 快取的回答沿用幾秒
 
 config = Configuration(access_token=LINE_CHANNEL_ACCESS_TOKEN)
 api_client = ApiClient(config)
@@ -30,31 +37,48 @@ handler = WebhookHandler(LINE_CHANNEL_SECRET)
 
 logging.basicConfig(level=logging.INFO)
 
+# 所有對 RAG server 的呼叫共用一個 Session，保持連線不必每則訊息重新建立 TCP 連線；
+# 連線失敗時以指數退避重試 (POST 不會在伺服器已收到請求後重送)
+SESSION = requests.Session()
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=Retry(total=3, backoff_factor=0.3))
+SESSION.mount("http://", _adapter)
+SESSION.mount("https://", _adapter)
+# (連線逾時, 讀取逾時)：RAG server 沒開時幾秒內就放棄，生成回答則仍可等 30 秒
+RAG_TIMEOUT = (5, 30)
+
+# 處理訊息 (呼叫 RAG server 並回覆) 的背景執行緒
+EXECUTOR = ThreadPoolExecutor(max_workers=int(os.getenv("REPLY_WORKERS", "8")))
+
 
 # =====================================================
 # 呼叫 RAG Server
 # =====================================================
+# 同一個問題 (完全相同的字串) 直接回傳上次的回答；失敗時丟出例外，錯誤訊息不會被快取。
+# ttl_bucket 是 ANSWER_CACHE_TTL 秒一段的時間編號，換段後就重新詢問，資料更新後不會一直回舊答案
+@lru_cache(maxsize=ANSWER_CACHE_SIZE)
+def _fetch_answer(question, ttl_bucket):
+    payload = {
+        "model": "ncu-rag-gemini",
+        "messages": [
+            {"role": "user", "content": question}
+        ],
+        "temperature": 0.1
+    }
+
+    logging.info(f"Calling RAG server: {RAG_SERVER_URL}")
+    res = SESSION.post(RAG_SERVER_URL, json=payload, timeout=RAG_TIMEOUT)
+    res.raise_for_status()
+    return res.json()["choices"][0]["message"]["content"]
+
+
 def ask_rag_server(question):
     """Call the RAG server with Gemini API to get answers"""
     try:
-        payload = {
-            "model": "ncu-rag-gemini",
-            "messages": [
-                {"role": "user", "content": question}
-            ],
-            "temperature": 0.1
-        }
-
-        logging.info(f"Calling RAG server: {RAG_SERVER_URL}")
-        res = requests.post(RAG_SERVER_URL, json=payload, timeout=30)
-        
-        if res.status_code == 200:
-            response_data = res.json()
-            answer = response_data["choices"][0]["message"]["content"]
-            return answer
-        else:
-            logging.error(f"RAG server error: HTTP {res.status_code}")
-            return f"抱歉，系統暫時無法回應。請稍後再試。(錯誤碼: {res.status_code})"
+        return _fetch_answer(question, int(time.time() // ANSWER_CACHE_TTL))
+    except requests.exceptions.HTTPError as e:
+        status = e.response.status_code
+        logging.error(f"RAG server error: HTTP {status}")
+        return f"抱歉，系統暫時無法回應。請稍後再試。(錯誤碼: {status})"
     except requests.exceptions.Timeout:
         logging.error("RAG server timeout")
         return "抱歉，系統回應時間過長。請稍後再試。"
@@ -109,6 +133,11 @@ def callback():
 @handler.add(MessageEvent, message=TextMessageContent)
 def handle_message(event):
     """Handle incoming messages from LINE"""
+    # 回答可能要好幾秒：交給背景執行緒處理，webhook 立即回 200 給 LINE
+    EXECUTOR.submit(_answer_and_reply, event)
+
+
+def _answer_and_reply(event):
     try:
         question = event.message.text.strip()
         logging.info(f"Received question: {question}")
@@ -124,7 +153,7 @@ def handle_message(event):
         messaging_api.reply_message(reply)
         logging.info("Reply sent successfully")
     except Exception as e:
-        logging.error(f"Error in handle_message: {e}")
+        logging.error(f"Error in _answer_and_reply: {e}")
         import traceback
         traceback.print_exc()
         # Try to send error message to user
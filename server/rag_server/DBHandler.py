@@ -1,276 +1,710 @@
-import os
-import traceback
-import pandas as pd
-from pathlib import Path
-from langchain_chroma import Chroma
-from langchain_core.documents import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_ollama import OllamaEmbeddings
-from pypdf import PdfReader
-
-# Load environment variables from .env file
-from dotenv import load_dotenv
-load_dotenv()
-
-from constants import *
-
-
-# 用於儲存向量資料庫以及檢索向量資料庫
-class DBHandler:
-    def __init__(self):
-        Path(DB_DIR).mkdir(parents=True, exist_ok=True)
-        self.docs_dir = Path(DOCS_DIR)
-        self.emb=self.getEmbeddings()
-
-    def getEmbeddings(self):
-        # 優先從環境變數讀取 OLLAMA_BASE_URL
-        base_url = os.getenv("OLLAMA_BASE_URL")
-        if not base_url:
-            # 如果未設置環境變數，則根據是否在 Docker 中來決定預設值
-            if os.path.exists('/.dockerenv'):
-                # In a container, connect to the 'ollama' service
-                base_url = "http://ollama:11434"
-            else:
-                # Running locally, connect to localhost
-                base_url = "http://localhost:11434"
-        
-        print(f"ℹ️  Connecting to Ollama at: {base_url}")
-        return OllamaEmbeddings(
-            model=OLLAMA_EMBED_MODEL,
-            base_url=base_url
-        )
-
-    def _log_error(self, message):
-        print(f"❌ Error: {message}")
-
-    def _log_info(self, message):
-        print(f"ℹ️  {message}")
-
-    def _load_pdf(self, file_path: Path) -> list[Document]:
-        try:
-            self._log_info(f"Processing PDF: {file_path.name}")
-            reader = PdfReader(file_path)
-            full_text = "".join(page.extract_text() for page in reader.pages if page.extract_text())
-
-            if not full_text:
-                self._log_info(f"No text extracted from PDF: {file_path.name}")
-                return []
-
-            metadata = {
-                'id': file_path.stem,
-                'title': file_path.stem,
-                'source': str(file_path.resolve()),
-                'category': file_path.parent.name,
-                'date': ""  # PDFs don't have a reliable date field
-            }
-            doc = Document(page_content=full_text, metadata=metadata)
-            return [doc]
-        except Exception as e:
-            self._log_error(f"Failed to process PDF {file_path.name}: {e}")
-            return []
-
-    def _load_csv(self, file_path: Path) -> list[Document]:
-        try:
-            self._log_info(f"Processing CSV: {file_path.name}")
-
-            # Special handling for news.csv, which has a clear structure
-            if 'news.csv' in file_path.name:
-                try:
-                    df = pd.read_csv(file_path, encoding="utf-8")
-                    # Check for expected columns
-                    expected_cols = ['list_title', 'detail_text', 'url', 'category', 'list_date']
-                    if not all(col in df.columns for col in expected_cols):
-                         raise ValueError(f"Missing one of the expected columns in {file_path.name}")
-
-                    docs = []
-                    for i, row in df.iterrows():
-                        content = f"[標題] {row['list_title']}\n[內容] {row['detail_text']}"
-                        metadata = {
-                            'id': f"{file_path.stem}_{i+1}",
-                            'title': str(row['list_title']),
-                            'source': str(row['url']),
-                            'category': str(row['category']),
-                            'date': str(row['list_date'])
-                        }
-                        doc = Document(page_content=content, metadata=metadata)
-                        docs.append(doc)
-                    return docs
-                except Exception as e:
-                    self._log_error(f"Could not process structured CSV {file_path.name}: {e}. Falling back to generic processing.")
-            
-            # Generic processing for all other CSVs
-            df = pd.read_csv(file_path, header=None, encoding="utf-8", on_bad_lines='skip')
-            if df.empty:
-                self._log_info(f"CSV file is empty or could not be read: {file_path.name}")
-                return []
-            
-            # Concatenate all rows into a single document
-            full_content = "\n".join([",".join(row.astype(str)) for _, row in df.iterrows()])
-            
-            if not full_content.strip():
-                self._log_info(f"No content in CSV: {file_path.name}")
-                return []
-
-            metadata = {
-                'id': file_path.stem,
-                'title': file_path.stem,
-                'source': str(file_path.resolve()),
-                'category': file_path.parent.name,
-                'date': ""
-            }
-            return [Document(page_content=full_content, metadata=metadata)]
-
-        except pd.errors.EmptyDataError:
-            self._log_info(f"Skipping empty or malformed CSV: {file_path.name}")
-            return []
-        except Exception as e:
-            self._log_error(f"Failed to process CSV {file_path.name}: {e}")
-            return []
-
-    def build_all_docs(self):
-        """Scans the DOCS_DIR, processes all PDF and CSV files, and yields Documents one by one."""
-        if not self.docs_dir.exists():
-            self._log_error(f"Documents directory not found at: {self.docs_dir.resolve()}")
-            return
-
-        self._log_info(f"Scanning for documents in: {self.docs_dir.resolve()}")
-        
-        files = list(self.docs_dir.rglob("*.pdf")) + list(self.docs_dir.rglob("*.csv"))
-        
-        if not files:
-            self._log_info("No PDF or CSV files found in the document directory.")
-            return
-            
-        self._log_info(f"Found {len(files)} files to process.")
-
-        for file_path in files:
-            if file_path.suffix == ".pdf":
-                yield from self._load_pdf(file_path)
-            elif file_path.suffix == ".csv":
-                yield from self._load_csv(file_path)
-
-    # 建向量庫
-    def buildDB(self, collection_name, doc_split=False, batch_size=50):
-        docs_generator = self.build_all_docs()
-
-        try:
-            first_doc = [next(docs_generator)]
-        except StopIteration:
-            self._log_error("No documents found to build database. Aborting.")
-            return
-
-        _ = self.emb.embed_query("ping")
-        print("Embedding warmup OK")
-
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=2000, chunk_overlap=200,
-            separators=["\n\n", "\n", "。", "，", " ", ""],
-        )
-        
-        # Split the first document
-        if doc_split:
-            first_doc = splitter.split_documents(first_doc)
-
-        print(f"Creating vector store with the first document...")
-        
-        # Create vector store with the first doc
-        vs = Chroma.from_documents(
-            documents=first_doc,
-            embedding=self.emb,
-            persist_directory=DB_DIR,
-            collection_name=collection_name,
-        )
-
-        # Process the rest of the documents in batches
-        batch = []
-        for doc in docs_generator:
-            batch.append(doc)
-            if len(batch) >= batch_size:
-                if doc_split:
-                    split_batch = splitter.split_documents(batch)
-                    print(f"Processing batch of {len(batch)} docs (split into {len(split_batch)} chunks)...")
-                    vs.add_documents(split_batch)
-                else:
-                    print(f"Processing batch of {len(batch)} docs...")
-                    vs.add_documents(batch)
-                batch = []
-        
-        # Add any remaining documents in the last batch
-        if batch:
-            if doc_split:
-                split_batch = splitter.split_documents(batch)
-                print(f"Processing final batch of {len(batch)} docs (split into {len(split_batch)} chunks)...")
-                vs.add_documents(split_batch)
-            else:
-                print(f"Processing final batch of {len(batch)} docs...")
-                vs.add_documents(batch)
-
-        print(f"\n✅ Successfully processed documents.")
-        print(f"Chroma DB built at: {Path(DB_DIR).resolve()}")
-
-
-    # 從vecter_store檢所前k個最相似的docs
-    def retrieve_context(self, vecter_store, query: str, k: int) -> str:
-        try:
-            if vecter_store is None:
-                self._log_error("Vector store is not available.")
-                return ""
-            docs = vecter_store.similarity_search(query, k=k)
-
-            sources = []
-            for d in docs:
-                source = d.metadata.get('source','無')
-                if not str(source).startswith("https"):
-                    source = str(source)
-                    source = source[source.rfind('/')+1:]
-                sources.append(source)
-
-            return "\n\n".join(
-                #f"[DOC {i+1}]"
-                #f"[id] {d.metadata.get('id','無')}\n"
-                f"[檔案名稱] {d.metadata.get('title','無')}\n"
-                f"[來源] {sources[i]}\n"
-                f"[日期] {d.metadata.get('date','無')}\n"
-                f"[檔案內容]:\n{d.page_content}"
-                for i, d in enumerate(docs)
-            )
-        except Exception as e:
-            self._log_error(f"Retrieve error: {e}")
-            traceback.print_exc()
-            return ""
-
-
-# 用來建向量庫的
-if __name__ == "__main__":
-    dbHandler = DBHandler()
-
-    print(f"\n{'='*80}")
-    print(f"Starting database build from all documents...")
-    
-    dbHandler.buildDB(
-        collection_name=COLLECTION_NAME,
-        doc_split=True,
-        batch_size=100  # Larger batch size can be more efficient if memory allows
-    )
-    
-    print("\n" + "="*80)
-    print("✅ Database build process finished.")
-    print("="*80)
-
-    # 3. Test retrieval (optional)
-    print("\nTesting retrieval function...")
-    try:
-        emb = dbHandler.getEmbeddings()
-        vs = Chroma(persist_directory=DB_DIR, embedding_function=emb, collection_name=COLLECTION_NAME)
-        
-        query = input("請輸入文字查詢相似文章 (or type QUIT):\n> ")
-        while query.upper() != "QUIT":
-            if query:
-                context = dbHandler.retrieve_context(vs, query, 5)
-                print("\n--- Retrieved Context ---\n")
-                print(context)
-                print("\n--- End of Context ---\n")
-            query = input("> ")
-    except Exception as e:
-        print(f"An error occurred during test retrieval: {e}")
+import os
+import io
+import json
+import hashlib
+import queue
+import threading
+import time
+import traceback
+import urllib.request
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+import chromadb
+import pandas as pd
+from pathlib import Path
+from langchain.embeddings import CacheBackedEmbeddings
+from langchain.storage import LocalFileStore
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_ollama import OllamaEmbeddings
+from pypdf import PdfReader
+
+from ResidentIndex import ResidentIndex
+from SemanticCache import current_build_id
+
+# 有 pyarrow 時 CSV 欄位存成 Arrow 字串陣列，不必為每一格建立 Python str 物件
+try:
+    import pyarrow  # noqa: F401
+    CSV_STR_DTYPE = "string[pyarrow]"
+except ImportError:
+    CSV_STR_DTYPE = str
+
+# pypdfium2 (PDFium 原生程式) 抽字比 pypdf 快很多；沒安裝時退回 pypdf
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+# Load environment variables from .env file
+from dotenv import load_dotenv
+load_dotenv()
+
+from constants import *
+
+
+def _log_error(message):
+    print(f"❌ Error: {message}")
+
+def _log_info(message):
+    print(f"ℹ️  {message}")
+
+def _extract_pdf_text(file_path: Path) -> str:
+    if pdfium is not None:
+        try:
+            pdf = pdfium.PdfDocument(str(file_path))
+            try:
+                return "".join(page.get_textpage().get_text_range() for page in pdf)
+            finally:
+                pdf.close()
+        except Exception as e:
+            # PDFium 打不開的檔案 (例如結構損壞) 改用 pypdf 再試一次
+            _log_info(f"pypdfium2 failed on {file_path.name} ({e}); falling back to pypdf")
+    reader = PdfReader(file_path)
+    # 每頁只抽一次文字 (原本判斷空頁時又抽了一次)
+    return "".join(filter(None, (page.extract_text() for page in reader.pages)))
+
+# 檔案載入放在模組層級 (而不是 DBHandler 的方法)，才能 pickle 後交給其他 process 執行
+def _load_pdf(file_path: Path) -> list[Document]:
+    try:
+        _log_info(f"Processing PDF: {file_path.name}")
+        full_text = _extract_pdf_text(file_path)
+
+        if not full_text:
+            _log_info(f"No text extracted from PDF: {file_path.name}")
+            return []
+
+        metadata = {
+            'id': file_path.stem,
+            'title': file_path.stem,
+            'source': str(file_path.resolve()),
+            'category': file_path.parent.name,
+            'date': ""  # PDFs don't have a reliable date field
+        }
+        doc = Document(page_content=full_text, metadata=metadata)
+        return [doc]
+    except Exception as e:
+        _log_error(f"Failed to process PDF {file_path.name}: {e}")
+        return None
+
+def _load_csv(file_path: Path) -> list[Document]:
+    try:
+        _log_info(f"Processing CSV: {file_path.name}")
+
+        # Special handling for news.csv, which has a clear structure
+        if 'news.csv' in file_path.name:
+            try:
+                # 全部讀成字串：略過型別推斷，空欄位是 "" 而不是 NaN
+                df = pd.read_csv(file_path, encoding="utf-8", engine="c", dtype=CSV_STR_DTYPE, keep_default_na=False)
+                # Check for expected columns
+                expected_cols = ['list_title', 'detail_text', 'url', 'category', 'list_date']
+                if not all(col in df.columns for col in expected_cols):
+                     raise ValueError(f"Missing one of the expected columns in {file_path.name}")
+
+                docs = []
+                # 直接 zip 各欄位，不用 iterrows 為每一列建立一個 Series
+                rows = zip(df['list_title'], df['detail_text'], df['url'], df['category'], df['list_date'])
+                for i, (title, detail, url, category, date) in enumerate(rows):
+                    content = f"[標題] {title}\n[內容] {detail}"
+                    metadata = {
+                        'id': f"{file_path.stem}_{i+1}",
+                        'title': str(title),
+                        'source': str(url),
+                        'category': str(category),
+                        'date': str(date)
+                    }
+                    doc = Document(page_content=content, metadata=metadata)
+                    docs.append(doc)
+                return docs
+            except Exception as e:
+                _log_error(f"Could not process structured CSV {file_path.name}: {e}. Falling back to generic processing.")
+
+        # Generic processing for all other CSVs
+        df = pd.read_csv(file_path, header=None, encoding="utf-8", on_bad_lines='skip',
+                         engine="c", dtype=CSV_STR_DTYPE, keep_default_na=False)
+        if df.empty:
+            _log_info(f"CSV file is empty or could not be read: {file_path.name}")
+            return []
+
+        # Concatenate all rows into a single document
+        # 交給 pandas 的 C 實作 CSV writer，不在 Python 裡逐列組字串
+        buf = io.StringIO()
+        df.to_csv(buf, index=False, header=False, lineterminator="\n")
+        full_content = buf.getvalue()
+
+        if not full_content.strip():
+            _log_info(f"No content in CSV: {file_path.name}")
+            return []
+
+        metadata = {
+            'id': file_path.stem,
+            'title': file_path.stem,
+            'source': str(file_path.resolve()),
+            'category': file_path.parent.name,
+            'date': ""
+        }
+        return [Document(page_content=full_content, metadata=metadata)]
+
+    except pd.errors.EmptyDataError:
+        _log_info(f"Skipping empty or malformed CSV: {file_path.name}")
+        return []
+    except Exception as e:
+        _log_error(f"Failed to process CSV {file_path.name}: {e}")
+        return None
+
+LOADERS = {".pdf": _load_pdf, ".csv": _load_csv}
+
+def _load_file(file_path: Path) -> list[Document] | None:
+    """載入單一檔案；讀取失敗時回傳 None (和「檔案沒有內容」的 [] 區分開來)。"""
+    docs = LOADERS[file_path.suffix.lower()](file_path)
+    if docs is not None:
+        # 記錄每個 chunk 來自哪個檔案，檔案修改或刪除時才能把它舊的 chunk 從向量庫移除
+        # (news.csv 的 source 是每則公告的網址，不能拿來對應檔案)
+        for doc in docs:
+            doc.metadata['file'] = str(file_path.resolve())
+    return docs
+
+
+# retrieve_context 回傳給 LLM 的每一段參考資料
+CONTEXT_TEMPLATE = (
+    #"[DOC {i}]"
+    #"[id] {id}\n"
+    "[檔案名稱] {title}\n"
+    "[來源] {source}\n"
+    "[日期] {date}\n"
+    "[檔案內容]:\n{content}"
+)
+
+# 整個 process 共用同一個 embeddings client 與每個 collection 各一個 Chroma handle，
+# 不會因為多建一個 DBHandler 就多開一組 HTTP 連線或重新打開 SQLite
+_shared = {"emb": None, "vs": {}, "index": {}, "index_loading": set()}
+_shared_lock = threading.Lock()
+
+
+# 用於儲存向量資料庫以及檢索向量資料庫
+class DBHandler:
+    def __init__(self):
+        Path(DB_DIR).mkdir(parents=True, exist_ok=True)
+        self.docs_dir = Path(DOCS_DIR)
+        self.emb=self.getEmbeddings()
+        # 相同的 (問題, k) 直接回傳上次檢索的結果，省下一次 query embedding 與向量搜尋；
+        # 失敗時會丟出例外，因此不會把空結果存進快取
+        self._format_context_cached = lru_cache(maxsize=RETRIEVE_CACHE_SIZE)(self._format_context)
+        # 同一個問題字串只 embed 一次 (語意快取查詢與檢索共用同一個向量)
+        self._embed_query = lru_cache(maxsize=RETRIEVE_CACHE_SIZE)(self._embed_query_batched)
+        self._build_id = current_build_id()  # 向量庫版本變了就清掉檢索快取
+        self._query_queue = queue.Queue()
+        self._query_worker = None
+        self._query_worker_lock = threading.Lock()
+        # buildDB 寫入 Chroma 用的背景執行緒：寫入第 N 批時就能同時 embed 第 N+1 批
+        self._writer = ThreadPoolExecutor(max_workers=1)
+        self._last_write = None
+        self._seen_chunk_texts = set()  # 本次 buildDB 已看過的 (檔案, chunk 內容雜湊)
+
+    def getEmbeddings(self):
+        with _shared_lock:
+            if _shared["emb"] is None:
+                _shared["emb"] = self._create_embeddings()
+            return _shared["emb"]
+
+    def get_vector_store(self, collection_name=COLLECTION_NAME):
+        with _shared_lock:
+            vs = _shared["vs"].get(collection_name)
+            if vs is None:
+                if CHROMA_HOST:
+                    # 連到獨立的 Chroma server (chroma run --path ./chroma_db)，寫入不必和本 process 搶同一個 SQLite
+                    client = chromadb.HttpClient(host=CHROMA_HOST, port=CHROMA_PORT)
+                    vs = Chroma(client=client, embedding_function=self.emb, collection_name=collection_name)
+                else:
+                    vs = Chroma(
+                        persist_directory=DB_DIR,
+                        embedding_function=self.emb,
+                        collection_name=collection_name,
+                    )
+                _shared["vs"][collection_name] = vs
+            return vs
+
+    @staticmethod
+    def ollama_base_url() -> str:
+        # 優先從環境變數讀取 OLLAMA_BASE_URL
+        base_url = os.getenv("OLLAMA_BASE_URL")
+        if not base_url:
+            # 如果未設置環境變數，則根據是否在 Docker 中來決定預設值
+            if os.path.exists('/.dockerenv'):
+                # In a container, connect to the 'ollama' service
+                base_url = "http://ollama:11434"
+            else:
+                # Running locally, connect to localhost
+                base_url = "http://localhost:11434"
+        return base_url
+
+    def embed_model_loaded(self) -> bool:
+        """詢問 Ollama (GET /api/ps) embedding 模型是否已經載入記憶體；查不到時當作未載入。"""
+        try:
+            with urllib.request.urlopen(self.ollama_base_url().rstrip("/") + "/api/ps", timeout=1) as res:
+                models = json.load(res).get("models", [])
+        except Exception:
+            return False
+        return any(m.get("name") == OLLAMA_EMBED_MODEL or m.get("model") == OLLAMA_EMBED_MODEL for m in models)
+
+    def get_resident_index(self, vecter_store):
+        """回傳 collection 的記憶體內向量矩陣；關閉、語料太大、載入失敗或還沒載入完成時回傳 None。
+
+        每 RESIDENT_INDEX_TTL 秒在背景重新載入一次，向量庫在別的 process 重建後最終會看到新內容；
+        載入期間繼續回傳上一份矩陣 (第一次載入時回傳 None，改走 Chroma 查詢)。
+        """
+        if not RESIDENT_INDEX:
+            return None
+        collection = vecter_store._collection
+        ttl_bucket = int(time.time() // RESIDENT_INDEX_TTL)
+        with _shared_lock:
+            cached = _shared["index"].get(collection.name)
+            if cached is not None and cached[1] == ttl_bucket:
+                return cached[0]
+            # 整個 collection 讀進記憶體很慢，不能拿著 lock 做，否則所有檢索都會卡住
+            if collection.name not in _shared["index_loading"]:
+                _shared["index_loading"].add(collection.name)
+                threading.Thread(target=self._load_resident_index, args=(collection, ttl_bucket),
+                                 name="resident-index", daemon=True).start()
+            return cached[0] if cached is not None else None
+
+    def _load_resident_index(self, collection, ttl_bucket: int):
+        index = None
+        try:
+            count = collection.count()
+            if 0 < count <= RESIDENT_INDEX_MAX:
+                index = ResidentIndex(collection, int8=RESIDENT_INDEX_INT8)
+                self._log_info(f"Loaded {len(index)} embeddings into memory for retrieval.")
+        except Exception as e:
+            # 失敗也記下來 (None)：這段時間內改走 Chroma 查詢，不必每個問題都重試載入
+            self._log_error(f"Failed to load embeddings into memory: {e}")
+        with _shared_lock:
+            _shared["index"][collection.name] = (index, ttl_bucket)
+            _shared["index_loading"].discard(collection.name)
+
+    def _create_embeddings(self):
+        base_url = self.ollama_base_url()
+        print(f"ℹ️  Connecting to Ollama at: {base_url}")
+        underlying = OllamaEmbeddings(
+            model=OLLAMA_EMBED_MODEL,
+            base_url=base_url
+        )
+        # 以文字內容的雜湊為 key 把向量存在磁碟上，重建向量庫或重複的問題不必再呼叫 Ollama；
+        # namespace 用模型名稱，換模型時不會拿到舊模型的向量 (LocalFileStore 的 key 不能含 ":")
+        store = LocalFileStore(EMBED_CACHE_DIR)
+        return CacheBackedEmbeddings.from_bytes_store(
+            underlying, store,
+            namespace=OLLAMA_EMBED_MODEL.replace(":", "_"),
+            query_embedding_cache=True,
+        )
+
+    def _log_error(self, message):
+        _log_error(message)
+
+    def _log_info(self, message):
+        _log_info(message)
+
+    def build_all_docs(self, manifest: dict | None = None, vs=None):
+        """Scans the DOCS_DIR, processes all PDF and CSV files, and yields Documents one by one.
+
+        If a manifest (path -> [mtime_ns, size]) and the vector store are given, files whose
+        mtime and size match the manifest are skipped. Chunks of files that changed or
+        disappeared are deleted from the store, and the manifest is updated in place:
+        a file is only recorded once it loaded successfully.
+        """
+        if not self.docs_dir.exists():
+            self._log_error(f"Documents directory not found at: {self.docs_dir.resolve()}")
+            return
+
+        self._log_info(f"Scanning for documents in: {self.docs_dir.resolve()}")
+        
+        # 只走訪一次目錄樹，依副檔名分派給對應的 loader
+        files = sorted(p for p in self.docs_dir.rglob("*") if p.suffix.lower() in LOADERS and p.is_file())
+        
+        if not files:
+            # 不動 manifest 與向量庫：DOCS_DIR 沒掛載好時不該把整個向量庫清空
+            self._log_info("No PDF or CSV files found in the document directory.")
+            return
+            
+        self._log_info(f"Found {len(files)} files to process.")
+
+        current = {}
+        if manifest is not None:
+            # 和上次建庫時的 mtime / size 相同的檔案已經在向量庫裡，不必再解析
+            changed = []
+            for p in files:
+                st = p.stat()
+                key = str(p.resolve())
+                current[key] = [st.st_mtime_ns, st.st_size]
+                if manifest.get(key) != current[key]:
+                    changed.append(p)
+            self._log_info(f"Skipping {len(files) - len(changed)} unchanged files.")
+
+            # 已經不存在的檔案：它的 chunk 也要從向量庫移除
+            removed = [key for key in manifest if key not in current]
+            for key in removed:
+                self._delete_file_chunks(vs, key)
+                del manifest[key]
+            if removed:
+                self._log_info(f"Removed chunks of {len(removed)} deleted files.")
+
+            files = changed
+            if not files:
+                return
+
+        # PDF 抽字吃 CPU 又受 GIL 限制，改用多個 process 同時載入；
+        # loader 自己處理錯誤，失敗的檔案回傳 None；結果依檔名順序交出去，每次建庫的順序都一樣
+        workers = max(1, min((os.cpu_count() or 2) - 1, len(files)))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_load_file, p) for p in files]
+            duplicates = 0
+            for p, future in zip(files, futures):
+                docs = future.result()
+                if docs is None:
+                    # 讀取失敗：保留舊的 chunk 與 manifest 記錄，下次建庫會再試一次
+                    continue
+                if manifest is not None:
+                    key = str(p.resolve())
+                    if key in manifest:
+                        # 檔案內容變了：先移除舊版本的 chunk，再加入新的
+                        self._delete_file_chunks(vs, key)
+                    manifest[key] = current[key]
+                # 同一個檔案裡內容完全相同的列只保留第一份。不跨檔案去重：每個檔案的 chunk
+                # 都要存在自己名下，否則保留下來的那份所屬檔案被修改或刪除時，另一個檔案的內容會跟著消失
+                # (重複內容的向量由 embedding 快取共用，不會重複呼叫 Ollama)
+                seen = set()
+                for doc in docs:
+                    digest = hashlib.blake2b(doc.page_content.encode("utf-8"), digest_size=16).digest()
+                    if digest in seen:
+                        duplicates += 1
+                        continue
+                    seen.add(digest)
+                    yield doc
+
+        if duplicates:
+            self._log_info(f"Skipped {duplicates} duplicate documents.")
+
+    @staticmethod
+    def _chunk_id(doc: Document) -> str:
+        # 以檔案、來源、頁碼與內容決定 id：內容沒變的 chunk 每次重建都得到同一個 id，
+        # 而且每個 id 只屬於一個檔案，刪除某檔案的 chunk 不會波及其他檔案
+        key = (f"{doc.metadata.get('file', '')}\x00{doc.metadata.get('source', '')}"
+               f"\x00{doc.metadata.get('page', '')}\x00{doc.page_content}")
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _add_new_chunks(self, vs, docs: list[Document], pending: dict) -> tuple[int, int, int]:
+        """把向量庫中還沒有的 chunk 放進 pending (id -> Document)，回傳 (新增數, 已存在數, 重複內容數)。
+
+        pending 累積到 CHROMA_ADD_BATCH 筆時才一次 embed 並寫入 Chroma，減少 commit 次數。
+        """
+        ids = []
+        duplicates = 0
+        for d in docs:
+            # 同一個檔案裡內容完全相同的 chunk 只存一份；不同檔案各存一份，
+            # 這樣刪除某個檔案的 chunk 不會帶走另一個檔案的內容 (向量仍只算一次，見 _flush_chunks)
+            text_digest = hashlib.blake2b(d.page_content.encode("utf-8"), digest_size=16).digest()
+            key = (d.metadata.get('file', ''), text_digest)
+            if key in self._seen_chunk_texts:
+                duplicates += 1
+                continue
+            self._seen_chunk_texts.add(key)
+            ids.append((self._chunk_id(d), d))
+
+        existing = set(vs.get(ids=[i for i, _ in ids], include=[])["ids"]) if ids else set()
+        added = 0
+        for chunk_id, d in ids:
+            if chunk_id not in existing:
+                pending[chunk_id] = d
+                added += 1
+
+        if len(pending) >= CHROMA_ADD_BATCH:
+            self._flush_chunks(vs, pending)
+        return added, len(ids) - added, duplicates
+
+    def _flush_chunks(self, vs, pending: dict):
+        """一次 embed pending 裡所有 chunk，再交給背景執行緒以 Chroma 允許的最大批次寫入。"""
+        if not pending:
+            return
+        ids = list(pending)
+        docs = list(pending.values())
+        texts = [d.page_content for d in docs]
+        # 不同檔案裡相同內容的 chunk 只 embed 一次，再對應回每一列
+        unique = list(dict.fromkeys(texts))
+        vectors = dict(zip(unique, self._embed_parallel(unique)))
+        embeddings = [vectors[t] for t in texts]
+        # 最多只讓一批在背景等著寫入，記憶體裡不會堆積太多已 embed 的 chunk
+        self._wait_for_write()
+        self._last_write = self._writer.submit(self._write_chunks, vs, ids, docs, texts, embeddings)
+        pending.clear()
+
+    def _write_chunks(self, vs, ids, docs, texts, embeddings):
+        step = min(CHROMA_ADD_BATCH, getattr(vs._client, "max_batch_size", CHROMA_ADD_BATCH))
+        for i in range(0, len(ids), step):
+            # 向量已經算好，失敗時只重試寫入本身，不必重新 embed；id 固定，重送也不會重複
+            for attempt in range(CHROMA_ADD_RETRIES):
+                try:
+                    vs._collection.add(
+                        ids=ids[i:i + step],
+                        embeddings=embeddings[i:i + step],
+                        metadatas=[d.metadata for d in docs[i:i + step]],
+                        documents=texts[i:i + step],
+                    )
+                    break
+                except Exception as e:
+                    if attempt == CHROMA_ADD_RETRIES - 1:
+                        raise
+                    self._log_error(f"Chroma write failed ({e}); retrying...")
+                    time.sleep(2 ** attempt)
+        print(f"Wrote {len(ids)} chunks to the vector store.")
+
+    def _wait_for_write(self):
+        """等上一批背景寫入完成；寫入失敗的例外會在這裡丟出。"""
+        if self._last_write is not None:
+            write, self._last_write = self._last_write, None
+            write.result()
+
+    def _embed_parallel(self, texts: list[str]) -> list[list[float]]:
+        """每 EMBED_BATCH_SIZE 筆送一次 embed 請求，最多 EMBED_WORKERS 個請求同時在 Ollama 上跑。"""
+        batches = [texts[i:i + EMBED_BATCH_SIZE] for i in range(0, len(texts), EMBED_BATCH_SIZE)]
+        if len(batches) == 1:
+            return self.emb.embed_documents(batches[0])
+        with ThreadPoolExecutor(max_workers=min(EMBED_WORKERS, len(batches))) as executor:
+            # map 保持原本順序，embedding 才能和 ids 對上
+            return [vec for batch in executor.map(self.emb.embed_documents, batches) for vec in batch]
+
+    @staticmethod
+    def _merge_small_chunks(chunks: list[Document]) -> list[Document]:
+        """把短於 MIN_CHUNK_SIZE 的碎片併回同一份文件的前一個 chunk。
+
+        這種碎片 (通常是文件最後幾個字) 資訊量太少，單獨 embed 既浪費一次運算又容易被誤檢索；
+        若碎片整段已包含在前一個 chunk 的 overlap 裡就直接丟掉。
+        """
+        merged = []
+        for chunk in chunks:
+            text = chunk.page_content
+            prev = merged[-1] if merged else None
+            if (prev is not None and len(text) < MIN_CHUNK_SIZE
+                    and prev.metadata.get('source') == chunk.metadata.get('source')):
+                if text.strip() and text not in prev.page_content:
+                    if len(prev.page_content) + len(text) <= CHUNK_SIZE + MIN_CHUNK_SIZE:
+                        prev.page_content += "\n" + text
+                    else:
+                        merged.append(chunk)
+                continue
+            merged.append(chunk)
+        return merged
+
+    def _delete_file_chunks(self, vs, file_key: str):
+        vs._collection.delete(where={"file": file_key})
+
+    def _load_manifest(self) -> dict:
+        try:
+            with open(MANIFEST_PATH, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self, manifest: dict):
+        tmp = MANIFEST_PATH + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, MANIFEST_PATH)
+
+    # 建向量庫
+    def buildDB(self, collection_name, doc_split=False, batch_size=50):
+        # Open (or create) the collection; chunks already stored under the
+        # same content id are skipped, so a rebuild only embeds what changed
+        vs = self.get_vector_store(collection_name)
+        # 向量庫是空的 (例如被刪掉重建) 時所有檔案都要重新處理，不能沿用舊的 manifest
+        has_chunks = vs._collection.count() > 0
+        manifest = self._load_manifest() if has_chunks else {}
+        if has_chunks:
+            sample = vs._collection.get(limit=1, include=["metadatas"])["metadatas"]
+            if not manifest or (sample and "file" not in (sample[0] or {})):
+                # 舊版建出來的 chunk 沒有 file 欄位，檔案修改或刪除時無法找到並移除它們
+                self._log_info("Existing chunks were built without file tracking; chunks of edited or "
+                               "deleted files cannot be removed. Rebuild from scratch to clean them up.")
+        docs_generator = self.build_all_docs(manifest, vs)
+
+        try:
+            first_doc = [next(docs_generator)]
+        except StopIteration:
+            if manifest:
+                # 可能只有刪除或讀取失敗的檔案，manifest 仍要更新
+                self._save_manifest(manifest)
+                self._log_info("No new or changed documents; the vector store is up to date.")
+            else:
+                self._log_error("No documents found to build database. Aborting.")
+            return
+
+        splitter = RecursiveCharacterTextSplitter(
+            chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP,
+            separators=["\n\n", "\n", "。", "，", " ", ""],
+        )
+        
+        # Split the first document
+        if doc_split:
+            first_doc = self._merge_small_chunks(splitter.split_documents(first_doc))
+
+        print(f"Adding the first document...")
+
+        pending = {}
+        self._seen_chunk_texts = set()
+        added, skipped, duplicates = self._add_new_chunks(vs, first_doc, pending)
+
+        # Process the rest of the documents in batches
+        batch = []
+        for doc in docs_generator:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                if doc_split:
+                    split_batch = self._merge_small_chunks(splitter.split_documents(batch))
+                    print(f"Processing batch of {len(batch)} docs (split into {len(split_batch)} chunks)...")
+                else:
+                    split_batch = batch
+                    print(f"Processing batch of {len(batch)} docs...")
+                n_added, n_skipped, n_duplicates = self._add_new_chunks(vs, split_batch, pending)
+                added += n_added
+                skipped += n_skipped
+                duplicates += n_duplicates
+                batch = []
+        
+        # Add any remaining documents in the last batch
+        if batch:
+            if doc_split:
+                split_batch = self._merge_small_chunks(splitter.split_documents(batch))
+                print(f"Processing final batch of {len(batch)} docs (split into {len(split_batch)} chunks)...")
+            else:
+                split_batch = batch
+                print(f"Processing final batch of {len(batch)} docs...")
+            n_added, n_skipped, n_duplicates = self._add_new_chunks(vs, split_batch, pending)
+            added += n_added
+            skipped += n_skipped
+            duplicates += n_duplicates
+        self._flush_chunks(vs, pending)
+        self._wait_for_write()
+        # 全部寫入成功後才記錄 manifest，中途失敗的話下次會重新處理這些檔案
+        self._save_manifest(manifest)
+
+        print(f"\n✅ Successfully processed documents ({added} chunks embedded, {skipped} unchanged chunks skipped, "
+              f"{duplicates} duplicate chunks dropped).")
+        print(f"Chroma DB built at: {Path(DB_DIR).resolve()}")
+
+
+    # 從vecter_store檢所前k個最相似的docs
+    def retrieve_context(self, vecter_store, query: str, k: int) -> str:
+        try:
+            if vecter_store is None:
+                self._log_error("Vector store is not available.")
+                return ""
+            # 別的 process 重建完向量庫會重寫 manifest，看到新版本就丟掉舊的檢索結果
+            build_id = current_build_id()
+            if build_id != self._build_id:
+                self._build_id = build_id
+                self.clear_retrieve_cache()
+            # 把時間切成 RETRIEVE_CACHE_TTL 秒一段放進 key：偵測不到的變動 (例如沒有 manifest) 最多沿用一段時間
+            ttl_bucket = int(time.time() // RETRIEVE_CACHE_TTL)
+            return self._format_context_cached(vecter_store, query, k, ttl_bucket)
+        except Exception as e:
+            self._log_error(f"Retrieve error: {e}")
+            traceback.print_exc()
+            return ""
+
+    def clear_retrieve_cache(self):
+        """向量庫重建後呼叫，丟掉舊的檢索結果與記憶體內的向量矩陣。"""
+        self._format_context_cached.cache_clear()
+        with _shared_lock:
+            _shared["index"].clear()
+
+    def _embed_query_batched(self, query: str) -> list[float]:
+        """把同一時間進來的問題合併成一次 embed_documents 呼叫 (micro-batching)。"""
+        with self._query_worker_lock:
+            if self._query_worker is None:
+                self._query_worker = threading.Thread(target=self._query_batch_loop, daemon=True)
+                self._query_worker.start()
+        fut = Future()
+        self._query_queue.put((query, fut))
+        return fut.result()
+
+    def _query_batch_loop(self):
+        while True:
+            batch = [self._query_queue.get()]
+            # 最多等 QUERY_BATCH_WAIT 秒，湊滿 QUERY_BATCH_SIZE 筆就先送出
+            try:
+                while len(batch) < QUERY_BATCH_SIZE:
+                    batch.append(self._query_queue.get(timeout=QUERY_BATCH_WAIT))
+            except queue.Empty:
+                pass
+
+            try:
+                vectors = self.emb.embed_documents([q for q, _ in batch])
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            for (_, fut), vec in zip(batch, vectors):
+                fut.set_result(vec)
+
+    def _format_context(self, vecter_store, query: str, k: int, ttl_bucket: int = 0) -> str:
+        q_emb = self._embed_query(query)
+        index = self.get_resident_index(vecter_store)
+        if index is not None:
+            metadatas, documents = index.query(q_emb, k)
+        else:
+            # 直接查 collection，不經過 LangChain 把結果包成 Document 再拆開
+            res = vecter_store._collection.query(
+                query_embeddings=[q_emb],
+                n_results=k,
+                include=["metadatas", "documents"],
+            )
+            metadatas, documents = res["metadatas"][0], res["documents"][0]
+
+        # 一次走訪結果就把每段套進模板，不再先建 sources 再逐段組 f-string
+        parts = []
+        for meta, content in zip(metadatas, documents):
+            meta = meta or {}
+            source = str(meta.get('source','無'))
+            if not source.startswith("https"):
+                source = source[source.rfind('/')+1:]
+            parts.append(CONTEXT_TEMPLATE.format(
+                title=meta.get('title','無'),
+                source=source,
+                date=meta.get('date','無'),
+                content=content,
+            ))
+        return "\n\n".join(parts)
+
+
+# 用來建向量庫的
+if __name__ == "__main__":
+    dbHandler = DBHandler()
+
+    print(f"\n{'='*80}")
+    print(f"Starting database build from all documents...")
+    
+    dbHandler.buildDB(
+        collection_name=COLLECTION_NAME,
+        doc_split=True,
+        batch_size=100  # Larger batch size can be more efficient if memory allows
+    )
+    
+    print("\n" + "="*80)
+    print("✅ Database build process finished.")
+    print("="*80)
+
+    # 3. Test retrieval (optional)
+    print("\nTesting retrieval function...")
+    try:
+        vs = dbHandler.get_vector_store(COLLECTION_NAME)
+        
+        query = input("請輸入文字查詢相似文章 (or type QUIT):\n> ")
+        while query.upper() != "QUIT":
+            if query:
+                context = dbHandler.retrieve_context(vs, query, 5)
+                print("\n--- Retrieved Context ---\n")
+                print(context)
+                print("\n--- End of Context ---\n")
+            query = input("> ")
+    except Exception as e:
+        print(f"An error occurred during test retrieval: {e}")
     
\ No newline at end of file
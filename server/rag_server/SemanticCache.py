@@ -0,0 +1,141 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from constants import *
+
+
+def current_build_id() -> int:
+    # 每次建庫結束都會重寫 manifest，用它的 mtime 當作向量庫的版本；還沒建過庫時是 0
+    try:
+        return os.stat(MANIFEST_PATH).st_mtime_ns
+    except OSError:
+        return 0
+
+
+# 問題語意相近 (cosine 相似度 >= 門檻) 時直接回傳之前的回答，不必再呼叫 LLM
+class SemanticCache:
+    def __init__(self, path=SEMANTIC_CACHE_PATH, threshold=SEMANTIC_CACHE_THRESHOLD,
+                 max_size=SEMANTIC_CACHE_SIZE, ttl=SEMANTIC_CACHE_TTL):
+        self.path = Path(path)
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._matrix = None   # (N, D) float32，每列都已正規化成單位向量
+        self._answers = []
+        self._created = []    # 每筆回答寫入的時間，超過 ttl 就不再回傳
+        self._last_used = []  # 用來決定 LRU 淘汰順序
+        self._tick = 0
+        self._build_id = current_build_id()
+        # 寫檔交給背景 thread，put 不必等 npz 寫完；_save_pending 讓連續的 put 只觸發一次寫檔
+        self._saver = ThreadPoolExecutor(max_workers=1)
+        self._save_pending = False
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            data = np.load(self.path)
+            if int(data["build_id"]) != self._build_id:
+                # 向量庫在快取寫入之後重建過，舊回答可能引用已經不存在的資料
+                print(f"ℹ️  Discarding semantic cache {self.path}: the vector store was rebuilt")
+                return
+            self._matrix = data["emb"].astype(np.float32)
+            self._answers = [str(a) for a in data["answers"]]
+            self._created = [float(t) for t in data["created"]]
+            self._last_used = list(range(len(self._answers)))
+            self._tick = len(self._answers)
+            print(f"ℹ️  Loaded {len(self._answers)} cached answers from {self.path}")
+        except Exception as e:
+            print(f"❌ Error: Failed to load semantic cache {self.path}: {e}")
+            self._clear()
+
+    def _clear(self):
+        self._matrix, self._answers, self._created, self._last_used = None, [], [], []
+
+    def _check_build(self):
+        """向量庫重建後清空快取 (呼叫時需持有 lock)。"""
+        build_id = current_build_id()
+        if build_id != self._build_id:
+            self._build_id = build_id
+            self._clear()
+
+    def _save(self):
+        with self._lock:
+            self._save_pending = False
+            if self._matrix is None:
+                return
+            # 在 lock 內複製一份，寫檔時其他請求可以繼續 get / put
+            matrix = self._matrix.copy()
+            answers = np.array(self._answers, dtype=str)
+            created = np.array(self._created, dtype=np.float64)
+            build_id = np.int64(self._build_id)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, emb=matrix, answers=answers, created=created, build_id=build_id)
+        tmp.replace(self.path)
+
+    @staticmethod
+    def _normalize(vec) -> np.ndarray:
+        v = np.asarray(vec, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def get(self, q_emb) -> str | None:
+        q = self._normalize(q_emb)
+        with self._lock:
+            self._check_build()
+            if self._matrix is None or self._matrix.shape[1] != q.shape[0]:
+                return None
+            # 一次矩陣乘法算出與所有舊問題的相似度，過期的回答不算
+            scores = self._matrix @ q
+            scores[np.asarray(self._created) < time.time() - self.ttl] = -np.inf
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            self._tick += 1
+            self._last_used[best] = self._tick
+            return self._answers[best]
+
+    def put(self, q_emb, answer: str):
+        q = self._normalize(q_emb)
+        now = time.time()
+        with self._lock:
+            self._check_build()
+            if self._matrix is None or self._matrix.shape[1] != q.shape[0]:
+                self._matrix, self._answers, self._created, self._last_used = q[None, :], [], [], []
+            elif len(self._answers) >= self.max_size:
+                # 滿了就覆蓋最久沒被用到的那一筆
+                i = int(np.argmin(self._last_used))
+                self._matrix[i] = q
+                self._answers[i] = answer
+                self._created[i] = now
+                self._tick += 1
+                self._last_used[i] = self._tick
+                self._schedule_save()
+                return
+            else:
+                self._matrix = np.vstack([self._matrix, q])
+            self._answers.append(answer)
+            self._created.append(now)
+            self._tick += 1
+            self._last_used.append(self._tick)
+            self._schedule_save()
+
+    def _schedule_save(self):
+        """排一次背景寫檔 (呼叫時需持有 lock)；已經有一次在排隊就不必再排。"""
+        if not self._save_pending:
+            self._save_pending = True
+            self._saver.submit(self._save_quietly)
+
+    def _save_quietly(self):
+        try:
+            self._save()
+        except Exception as e:
+            print(f"❌ Error: Failed to save semantic cache {self.path}: {e}")
@@ -3,7 +3,25 @@ import os
 DOCS_DIR = r"../../crawler/docs"
 DB_DIR = r"./chroma_db"
 COLLECTION_NAME = "ncu"
+# Set CHROMA_HOST to use a Chroma server (`chroma run --path ./chroma_db`) instead of the embedded DB_DIR store
+CHROMA_HOST = os.getenv("CHROMA_HOST", "")
+CHROMA_PORT = int(os.getenv("CHROMA_PORT", "8000"))
 TOP_K = 10
+RETRIEVE_CACHE_SIZE = 1024  # distinct (query, k) contexts kept in memory
+RETRIEVE_CACHE_TTL = 3600   # seconds before a cached context is looked up again
+# Keep all embeddings in a numpy matrix and search it exactly instead of querying Chroma
+RESIDENT_INDEX = os.getenv("RESIDENT_INDEX", "0") == "1"
+RESIDENT_INDEX_MAX = 50_000   # larger collections fall back to Chroma's HNSW search
+RESIDENT_INDEX_TTL = 3600     # seconds before the resident matrix is reloaded from Chroma
+RESIDENT_INDEX_INT8 = os.getenv("RESIDENT_INDEX_INT8", "0") == "1"  # quantize the resident matrix to int8 (1/4 the memory)
+QUERY_BATCH_SIZE = 16       # concurrent questions embedded in one Ollama call
+QUERY_BATCH_WAIT = 0.01     # seconds to wait for more questions before flushing
+
+# Semantic answer cache: reuse the answer of a near-identical earlier question
+SEMANTIC_CACHE_PATH = os.path.join(DB_DIR, "semantic_cache.npz")
+SEMANTIC_CACHE_THRESHOLD = 0.92  # minimum cosine similarity for a hit
+SEMANTIC_CACHE_SIZE = 1024       # answers kept before the least recently used is replaced
+SEMANTIC_CACHE_TTL = 86400       # seconds before a cached answer is no longer returned
 
 # Gemini API settings
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
@@ -13,4 +31,13 @@ GEMINI_FLASH_MODEL = "gemini-2.5-flash"
 # Ollama embedding settings
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL") # URL is determined dynamically if not set
 OLLAMA_EMBED_MODEL = "qwen3-embedding:0.6b"
+EMBED_BATCH_SIZE = 64  # texts per embed request
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "4"))  # embed requests in flight at once while building the DB; keep <= OLLAMA_NUM_PARALLEL
+EMBED_CACHE_DIR = os.path.join(DB_DIR, "emb_cache")  # on-disk cache of computed embeddings
+CHUNK_SIZE = 2000        # characters per chunk when splitting documents
+CHUNK_OVERLAP = 200      # characters shared by neighbouring chunks
+MIN_CHUNK_SIZE = 100     # shorter trailing fragments are merged into the previous chunk
+CHROMA_ADD_BATCH = 5000  # new chunks buffered before one bulk collection.add
+CHROMA_ADD_RETRIES = 3   # attempts per collection.add before the build fails
+MANIFEST_PATH = os.path.join(DB_DIR, "manifest.json")  # mtime/size of files already in the DB
 
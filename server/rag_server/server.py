@@ -1,5 +1,5 @@
 from __future__ import annotations
-import os, time, argparse, traceback
+import os, time, json, argparse, asyncio, threading, traceback
 from typing import List, Optional
 from dotenv import load_dotenv
 
@@ -7,15 +7,14 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, ConfigDict
 
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, SystemMessage
 
 from DBHandler import DBHandler
-
-from langchain_chroma import Chroma
+from SemanticCache import SemanticCache
 
 from constants import *
 
@@ -42,6 +41,8 @@ SYSTEM_PROMPT = (
 
 #用於儲存向量資料庫以及檢索向量資料庫
 dbHandler = DBHandler()
+# 語意相近的問題直接回傳快取的回答
+semanticCache = SemanticCache() if MODE == "rag" else None
 
 class Message(BaseModel):
     model_config = ConfigDict(extra="allow")
@@ -56,6 +57,19 @@ class ChatCompletionRequest(BaseModel):
     top_k: Optional[int] = None
     stream: Optional[bool] = False
 
+# 每個 temperature 只建立一次 LLM client，之後的請求共用同一個實例與其連線
+_llm_cache: dict = {}
+
+def get_llm(temperature: float) -> ChatGoogleGenerativeAI:
+    llm = _llm_cache.get(temperature)
+    if llm is None:
+        llm = _llm_cache.setdefault(temperature, ChatGoogleGenerativeAI(
+            model=GEMINI_FLASH_MODEL,
+            google_api_key=GEMINI_API_KEY,
+            temperature=temperature
+        ))
+    return llm
+
 def ensure_rag_ready(collection_name=COLLECTION_NAME):
     if _state["vs"] is not None:
         return
@@ -63,8 +77,7 @@ def ensure_rag_ready(collection_name=COLLECTION_NAME):
     try:
         # Use the embedding object from the global dbHandler
         emb = dbHandler.emb
-        _ = emb.embed_query("ping")
-        vs = Chroma(persist_directory=DB_DIR, embedding_function=emb, collection_name=collection_name)
+        vs = dbHandler.get_vector_store(collection_name)
         _state["emb"] = emb
         _state["vs"] = vs
         _state["err"] = None
@@ -72,13 +85,33 @@ def ensure_rag_ready(collection_name=COLLECTION_NAME):
         _state["err"] = f"init failed: {e}"
         raise
 
+def _warm_rag():
+    try:
+        ensure_rag_ready()
+        dbHandler.get_resident_index(_state["vs"])
+        # 模型已經在 Ollama 記憶體裡 (例如只重啟了 RAG server) 就不必再送一次暖機查詢
+        if dbHandler.embed_model_loaded():
+            print("ℹ️  Embedding model already loaded; skipping warmup query")
+            return
+        # 查一次讓 Ollama 載入 embedding 模型、Chroma 把 HNSW 索引讀進記憶體
+        dbHandler.retrieve_context(_state["vs"], "warmup", 1)
+        print("ℹ️  RAG warmup done")
+    except Exception as e:
+        print("[startup] RAG warmup failed:", e)
+
+@app.on_event("startup")
+def warm_up():
+    # 在背景執行緒暖機，port 可以立刻開始回應 /health；第一位使用者不必等冷啟動
+    if MODE == "rag":
+        threading.Thread(target=_warm_rag, daemon=True).start()
+
 @app.get("/health")
 def health():
     return {
         "ok": True,
         "mode": MODE,
         "llm_model": GEMINI_FLASH_MODEL,
-        "embed_model": dbHandler.emb.model,
+        "embed_model": OLLAMA_EMBED_MODEL,
         "db_path": DB_DIR,
         "ready": (_state["vs"] is not None) if MODE == "rag" else True,
         "init_error": _state["err"],
@@ -95,37 +128,104 @@ def debug_files():
 def models():
     return {"object": "list", "data": [{"id": "ncu-rag-gemini", "object": "model"}]}
 
+def _log_exchange(last_user: str, context: Optional[str], ans: str):
+    print('='*80)
+    print("USER:"+last_user)
+    if context is not None:
+        print("與問題相關之資訊:")
+        print(context)
+    print('-'*80)
+    print("ASSISTANT:")
+    print(ans)
+    print('='*80)
+
+def _stream_chat(llm, prompt, model: str, last_user: str, context: Optional[str],
+                 cached: Optional[str] = None, q_emb=None):
+    """Yield the answer as OpenAI-style `chat.completion.chunk` server-sent events.
+
+    A `cached` answer is sent as a single chunk without calling the LLM; otherwise
+    the streamed answer is stored in the semantic cache under `q_emb` once complete,
+    unless retrieval returned no context.
+    """
+    chunk_id = f"chatcmpl-{int(time.time())}"
+    created = int(time.time())
+
+    def event(delta: dict, finish_reason=None) -> str:
+        payload = {
+            "id": chunk_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    parts = []
+    try:
+        yield event({"role": "assistant", "content": ""})
+        if cached is not None:
+            parts.append(cached)
+            yield event({"content": cached})
+        else:
+            for chunk in llm.stream(prompt):
+                if chunk.content:
+                    parts.append(chunk.content)
+                    yield event({"content": chunk.content})
+            # 檢索失敗時 context 是空字串，這時的「查無資料」回答不能快取起來
+            if q_emb is not None and context:
+                semanticCache.put(q_emb, "".join(parts))
+        yield event({}, finish_reason="stop")
+    except Exception as e:
+        print("[/v1/chat/completions] stream error:", e)
+        traceback.print_exc()
+        yield f"data: {json.dumps({'error': str(e)}, ensure_ascii=False)}\n\n"
+    yield "data: [DONE]\n\n"
+    _log_exchange(last_user, context, "".join(parts))
+
 @app.post("/v1/chat/completions")
-def chat(req: ChatCompletionRequest):
+async def chat(req: ChatCompletionRequest):
+    # 會阻塞的 embedding / 檢索 / 寫檔都丟到 worker thread，LLM 用 ainvoke；
+    # event loop 不會被卡住，同時處理的請求數不再受限於 threadpool 大小
     try:
         last_user = ""
         for m in req.messages:
             if m.role == "user":
                 last_user = m.content
 
-        llm = ChatGoogleGenerativeAI(
-            model=GEMINI_FLASH_MODEL,
-            google_api_key=GEMINI_API_KEY,
-            temperature=req.temperature or 0.1
-        )
+        llm = get_llm(req.temperature or 0.1)
 
+        # 先查語意快取：命中就不必檢索也不必呼叫 LLM；llm 模式不需要 embedding 模型，也就不查快取
+        q_emb, cached = None, None
         if MODE == "rag":
-            ensure_rag_ready()
-            context = dbHandler.retrieve_context(_state['vs'], last_user, req.top_k or TOP_K)
+            try:
+                q_emb = await asyncio.to_thread(dbHandler._embed_query, last_user)
+                cached = semanticCache.get(q_emb)
+            except Exception as e:
+                print("[/v1/chat/completions] semantic cache lookup failed:", e)
+
+        context = None
+        if cached is not None:
+            prompt = None
+        elif MODE == "rag":
+            await asyncio.to_thread(ensure_rag_ready)
+            context = await asyncio.to_thread(dbHandler.retrieve_context, _state['vs'], last_user, req.top_k or TOP_K)
             sys_prompt = SYSTEM_PROMPT.format(context=context)
-            ans = llm.invoke([SystemMessage(sys_prompt), HumanMessage(content=last_user)]).content
+            prompt = [SystemMessage(sys_prompt), HumanMessage(content=last_user)]
         else:
-            ans = llm.invoke(last_user).content
+            prompt = last_user
 
-        print('='*80)
-        print("USER:"+last_user)
-        if MODE == "rag":
-            print("與問題相關之資訊:")
-            print(context)
-        print('-'*80)
-        print("ASSISTANT:")
-        print(ans)
-        print('='*80)
+        if req.stream:
+            # 逐 token 以 SSE 回傳，使用者不必等整段回答生成完才看到第一個字
+            return StreamingResponse(_stream_chat(llm, prompt, req.model, last_user, context, cached, q_emb),
+                                     media_type="text/event-stream")
+
+        if cached is not None:
+            ans = cached
+        else:
+            ans = (await llm.ainvoke(prompt)).content
+            if q_emb is not None and context:
+                semanticCache.put(q_emb, ans)
+        _log_exchange(last_user, context, ans)
 
         return JSONResponse(content={
             "id": f"chatcmpl-{int(time.time())}",